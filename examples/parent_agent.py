@@ -5,16 +5,31 @@ This example demonstrates how to integrate the RAG agent as a specialized
 node within a larger parent graph that coordinates multiple agents.
 
 Architecture:
-    Entry → Router → [RAG Agent | Weather Agent | Calculator] → Response Formatter → END
+    Entry → Prevalidate → Router → [RAG Agent | Weather Agent | Calculator] → Response Formatter → END
+
+Empty questions are answered by the prevalidate node and sent straight to
+the formatter, skipping every LLM call.
+
+When the router cannot make a confident choice, the question is fanned out to
+the RAG and general agents in parallel via LangGraph's ``Send`` API. The demo
+questions are executed concurrently with ``abatch``.
 """
 import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+import threading
 import httpx
-from typing import Literal
+from collections import OrderedDict
+from typing import Awaitable, Callable, FrozenSet, List, Literal, Optional, Tuple, Union
 from dotenv import load_dotenv
 
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 from langgraph.graph import StateGraph, MessagesState, END
+from langgraph.types import Send
 
 # Import RAG subgraph
 import sys
@@ -41,13 +56,139 @@ class ParentState(MessagesState):
 
 
 # ============================================================================
-# Router Node
+# Pre-validation Node
+# ============================================================================
+
+EMPTY_QUESTION_REPLY = "請輸入您的問題。"
+
+
+def _message_text(message) -> str:
+    """Return the text content of a message or message-like object."""
+    return message.content if hasattr(message, 'content') else str(message)
+
+
+def create_prevalidate_node():
+    """Create an entry node that answers trivial input without any LLM call.
+
+    Empty/whitespace questions get a canned reply and are sent straight to
+    the formatter, skipping the router and agents. Repeated questions are
+    answered afresh so the user can retry after an error or a poor answer.
+    """
+    def prevalidate(state: ParentState) -> dict:
+        messages = state.get('messages') or []
+        question = _message_text(messages[-1]) if messages else ""
+
+        if not question.strip():
+            print("[Prevalidate] Empty question, skipping agents")
+            return {
+                "messages": [AIMessage(content=EMPTY_QUESTION_REPLY)],
+                "current_agent": "formatter",
+                "task_type": "trivial"
+            }
+
+        return {}
+
+    return prevalidate
+
+
+def route_after_prevalidate(state: ParentState) -> Literal["router", "formatter"]:
+    """Conditional edge: skip straight to the formatter for short-circuited input."""
+    return "formatter" if state.get("current_agent") == "formatter" else "router"
+
+
+# ============================================================================
+# Router Keyword Fast Path
 # ============================================================================
 
-def create_router_node(llm: ChatOpenAI):
-    """Create a router node that decides which specialized agent to use."""
+# Unambiguous keywords checked in order before falling back to the LLM.
+# A bare "法" is deliberately excluded since it also matches 方法/算法, and
+# a bare "辦法" since it also means "a way to" (有什麼辦法...).
+_RE_LAW_QUERY = re.compile(r"第.{1,6}條|法規|法律|條例|規則|條文|施行細則|管理辦法")
+_RE_WEATHER_QUERY = re.compile(r"天氣|氣溫|下雨|weather", re.IGNORECASE)
+# "-" and "/" must be spaced so dates such as 2024-10-01 or 2024/10/01 don't match.
+_RE_CALC_QUERY = re.compile(r"\d+(?:\s*[+*×÷]\s*|\s+[-/]\s+)\d+|計算")
+
+_KEYWORD_ROUTES = (
+    (_RE_LAW_QUERY, "rag_agent"),
+    (_RE_WEATHER_QUERY, "weather_agent"),
+    (_RE_CALC_QUERY, "calculator_agent"),
+)
+
+
+def match_keyword_route(question: str) -> Optional[str]:
+    """Return the agent for a question with an unambiguous keyword, else None."""
+    for pattern, agent in _KEYWORD_ROUTES:
+        if pattern.search(question):
+            return agent
+    return None
+
+
+# ============================================================================
+# Router Decision Cache
+# ============================================================================
 
-    ROUTER_PROMPT = """你是一個智慧路由器，負責將使用者的問題分配給最適合的專業代理。
+def normalize_question(question: str) -> str:
+    """Lowercase a question and collapse all whitespace runs."""
+    return " ".join(question.lower().split())
+
+
+def _question_tokens(normalized: str) -> FrozenSet[str]:
+    """Character bigrams of a normalized question (works for CJK and Latin text)."""
+    compact = normalized.replace(" ", "")
+    if len(compact) < 2:
+        return frozenset([compact])
+    return frozenset(compact[i:i + 2] for i in range(len(compact) - 1))
+
+
+class RouteCache:
+    """Thread-safe bounded LRU of routing decisions.
+
+    Lookups are tiered:
+    - Tier 0: exact match on the normalized question.
+    - Tier 1: fuzzy match using Jaccard similarity of character bigrams.
+    """
+
+    def __init__(self, maxsize: int = 512, fuzzy_threshold: float = 0.6):
+        self.maxsize = maxsize
+        self.fuzzy_threshold = fuzzy_threshold
+        self._entries: "OrderedDict[str, Tuple[FrozenSet[str], Tuple[str, str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, normalized: str) -> Optional[Tuple[str, str]]:
+        """Return the cached ``(selected_agent, task_type)`` for a question, if any."""
+        with self._lock:
+            entry = self._entries.get(normalized)
+            if entry is not None:
+                self._entries.move_to_end(normalized)
+                return entry[1]
+
+            tokens = _question_tokens(normalized)
+            best_key, best_score = None, 0.0
+            for key, (cached_tokens, _) in self._entries.items():
+                union = len(tokens | cached_tokens)
+                score = len(tokens & cached_tokens) / union if union else 0.0
+                if score > best_score:
+                    best_key, best_score = key, score
+
+            if best_key is not None and best_score >= self.fuzzy_threshold:
+                self._entries.move_to_end(best_key)
+                return self._entries[best_key][1]
+            return None
+
+    def put(self, normalized: str, decision: Tuple[str, str]) -> None:
+        """Store a routing decision, evicting the least recently used entry."""
+        with self._lock:
+            self._entries[normalized] = (_question_tokens(normalized), decision)
+            self._entries.move_to_end(normalized)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+# ============================================================================
+# Router Node
+# ============================================================================
+
+ROUTER_PROMPT = """你是一個智慧路由器，負責將使用者的問題分配給最適合的專業代理。
 
 可用的代理：
 1. rag_agent - 法律文件問答專家，處理法規、條文相關問題
@@ -58,17 +199,62 @@ def create_router_node(llm: ChatOpenAI):
 請分析使用者的問題，並選擇最適合的代理。只回覆代理名稱，不要解釋。
 """
 
-    def router_node(state: ParentState) -> dict:
+
+def _router_system_message(llm: ChatOpenAI) -> SystemMessage:
+    """Build the router's system message once so every request shares its prefix.
+
+    OpenAI-compatible servers cache a byte-identical prompt prefix
+    automatically; Anthropic models need an explicit cache_control marker.
+    """
+    if getattr(llm, "_llm_type", "") == "anthropic-chat":
+        return SystemMessage(content=[{
+            "type": "text",
+            "text": ROUTER_PROMPT,
+            "cache_control": {"type": "ephemeral"}
+        }])
+    return SystemMessage(content=ROUTER_PROMPT)
+
+
+def create_router_node(llm: ChatOpenAI, cache: Optional[RouteCache] = None):
+    """Create a router node that decides which specialized agent to use.
+
+    Args:
+        llm: Language model used for classification
+        cache: Optional routing cache; a private one is created if omitted
+    """
+    route_cache = cache if cache is not None else RouteCache()
+    # Static prefix first, the question is the only volatile suffix
+    system_message = _router_system_message(llm)
+
+    async def router_node(state: ParentState) -> dict:
         """Route the question to the appropriate specialized agent."""
         last_message = state['messages'][-1]
         question = last_message.content if hasattr(last_message, 'content') else str(last_message)
 
         print(f"\n[Router] Analyzing question: {question}")
 
+        keyword_agent = match_keyword_route(question)
+        if keyword_agent is not None:
+            print(f"[Router] Keyword match, selected agent: {keyword_agent}")
+            return {
+                "current_agent": keyword_agent,
+                "task_type": keyword_agent
+            }
+
+        normalized = normalize_question(question)
+        cached = route_cache.get(normalized)
+        if cached is not None:
+            selected_agent, agent_choice = cached
+            print(f"[Router] Cache hit, selected agent: {selected_agent}")
+            return {
+                "current_agent": selected_agent,
+                "task_type": agent_choice
+            }
+
         # Use LLM to determine routing
-        response = llm.invoke([
-            {"role": "system", "content": ROUTER_PROMPT},
-            {"role": "user", "content": question}
+        response = await llm.ainvoke([
+            system_message,
+            HumanMessage(content=question)
         ])
 
         agent_choice = response.content.strip().lower()
@@ -81,8 +267,11 @@ def create_router_node(llm: ChatOpenAI):
             "general_agent": "general_agent"
         }
 
-        selected_agent = agent_map.get(agent_choice, "general_agent")
+        # An unrecognised answer means the router is uncertain; let the
+        # routing edge fan the question out to several agents in parallel.
+        selected_agent = agent_map.get(agent_choice, PARALLEL_DISPATCH)
         print(f"[Router] Selected agent: {selected_agent}")
+        route_cache.put(normalized, (selected_agent, agent_choice))
 
         return {
             "current_agent": selected_agent,
@@ -116,14 +305,124 @@ def create_calculator_agent():
 
 def create_general_agent(llm: ChatOpenAI):
     """General conversation agent."""
-    def general_agent(state: ParentState) -> dict:
+    async def general_agent(state: ParentState) -> dict:
         print("[General Agent] Processing general query...")
         messages = state['messages']
-        response = llm.invoke(messages)
+        response = await llm.ainvoke(messages)
         return {"messages": [response]}
     return general_agent
 
 
+def create_rag_agent(rag_subgraph):
+    """Wrap the compiled RAG subgraph so it can be cached like the other agents.
+
+    The subgraph expects a ``question`` key, and the DATCOM branch only writes
+    ``generation``; the wrapper supplies the former and turns the latter into
+    an AIMessage. Only messages the subgraph added are returned. If the
+    subgraph reports an error, its apology is returned as a failed reply.
+    """
+    async def rag_agent(state: ParentState) -> dict:
+        messages = state['messages']
+        result = await rag_subgraph.ainvoke({
+            "messages": messages,
+            "question": _message_text(messages[-1])
+        })
+
+        if result.get("error"):
+            return {"messages": [_failed_reply(result.get("generation", ""))]}
+
+        seen_ids = {m.id for m in messages}
+        new_messages = [m for m in result.get("messages", []) if m.id not in seen_ids]
+        generation = result.get("generation", "")
+        if generation and not any(isinstance(m, AIMessage) for m in new_messages):
+            new_messages.append(AIMessage(content=generation))
+        return {"messages": new_messages}
+    return rag_agent
+
+
+# ============================================================================
+# Response Cache
+# ============================================================================
+
+def _failed_reply(content: str) -> AIMessage:
+    """An AIMessage marked as the reply of a failed agent run."""
+    return AIMessage(content=content, response_metadata={"failed": True})
+
+
+def is_successful_reply(message) -> bool:
+    """True for a non-empty AI reply that is not marked as failed."""
+    return (
+        isinstance(message, AIMessage)
+        and bool(_message_text(message).strip())
+        and not message.response_metadata.get("failed")
+    )
+
+
+def messages_cache_key(messages: list) -> bytes:
+    """SHA256 digest of the canonicalized (role, content) message list."""
+    payload = json.dumps(
+        [{"role": getattr(m, 'type', 'human'), "content": _message_text(m)} for m in messages],
+        ensure_ascii=False,
+        default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).digest()
+
+
+class ResponseCache:
+    """Thread-safe LRU of agent outputs with a time-to-live."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, bytes], Tuple[dict, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, bytes]) -> Optional[dict]:
+        """Return a cached, unexpired output or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            output, stored_at = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return output
+
+    def put(self, key: Tuple[str, bytes], output: dict) -> None:
+        """Store an output, evicting the least recently used entry."""
+        with self._lock:
+            self._entries[key] = (output, time.monotonic())
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+def cached_agent(
+    name: str,
+    agent: Callable[[ParentState], Awaitable[dict]],
+    cache: ResponseCache
+) -> Callable[[ParentState], Awaitable[dict]]:
+    """Wrap an async agent node so identical message histories hit the cache.
+
+    Only outputs ending in a successful reply are stored, so a transient
+    failure is retried on the next identical request instead of replayed.
+    """
+    async def wrapper(state: ParentState) -> dict:
+        key = (name, messages_cache_key(state['messages']))
+        cached = cache.get(key)
+        if cached is not None:
+            print(f"[Cache] Reusing {name} response")
+            return cached
+        output = await agent(state)
+        replies = [m for m in output.get("messages", []) if isinstance(m, AIMessage)]
+        if replies and is_successful_reply(replies[-1]):
+            cache.put(key, output)
+        return output
+    return wrapper
+
+
 # ============================================================================
 # Response Formatter Node
 # ============================================================================
@@ -142,9 +441,25 @@ def create_response_formatter():
 # Routing Logic
 # ============================================================================
 
-def route_to_agent(state: ParentState) -> Literal["rag_agent", "weather_agent", "calculator_agent", "general_agent"]:
-    """Conditional edge: route to the selected agent."""
-    agent = state.get("current_agent", "general_agent")
+# Sentinel agent name used by the router when no single agent is a clear fit
+PARALLEL_DISPATCH = "parallel_dispatch"
+
+# Agents that run concurrently when the router is uncertain
+PARALLEL_AGENTS = ("rag_agent", "general_agent")
+
+
+def route_to_agent(
+    state: ParentState
+) -> Union[Literal["rag_agent", "weather_agent", "calculator_agent", "general_agent"], List[Send]]:
+    """Conditional edge: route to the selected agent.
+
+    If the router was uncertain, the state is sent to every agent in
+    ``PARALLEL_AGENTS`` so they run in the same superstep.
+    """
+    agent = state.get("current_agent") or "general_agent"
+    if agent == PARALLEL_DISPATCH:
+        print(f"[Routing] Dispatching in parallel to: {', '.join(PARALLEL_AGENTS)}")
+        return [Send(name, state) for name in PARALLEL_AGENTS]
     print(f"[Routing] Directing to: {agent}")
     return agent
 
@@ -169,23 +484,40 @@ def build_parent_graph(llm: ChatOpenAI, rag_config: RAGConfig) -> StateGraph:
     graph = StateGraph(ParentState)
 
     # Create specialized agents
+    prevalidate = create_prevalidate_node()
     router = create_router_node(llm)
     rag_subgraph = create_rag_subgraph(llm, rag_config, name="rag_legal_expert")
+    rag_agent = create_rag_agent(rag_subgraph)
     weather_agent = create_weather_agent()
     calculator_agent = create_calculator_agent()
     general_agent = create_general_agent(llm)
     formatter = create_response_formatter()
 
+    # LLM agents are only deterministic (and thus cacheable) at temperature 0
+    if getattr(llm, "temperature", None) == 0:
+        response_cache = ResponseCache()
+        rag_agent = cached_agent("rag_agent", rag_agent, response_cache)
+        general_agent = cached_agent("general_agent", general_agent, response_cache)
+
     # Add nodes
+    graph.add_node("prevalidate", prevalidate)
     graph.add_node("router", router)
-    graph.add_node("rag_agent", rag_subgraph)  # RAG as subgraph
+    graph.add_node("rag_agent", rag_agent)  # Wraps the RAG subgraph
     graph.add_node("weather_agent", weather_agent)
     graph.add_node("calculator_agent", calculator_agent)
     graph.add_node("general_agent", general_agent)
     graph.add_node("formatter", formatter)
 
-    # Set entry point
-    graph.set_entry_point("router")
+    # Set entry point: trivial input bypasses the router and agents
+    graph.set_entry_point("prevalidate")
+    graph.add_conditional_edges(
+        "prevalidate",
+        route_after_prevalidate,
+        {
+            "router": "router",
+            "formatter": "formatter"
+        }
+    )
 
     # Conditional routing after router
     graph.add_conditional_edges(
@@ -212,11 +544,59 @@ def build_parent_graph(llm: ChatOpenAI, rag_config: RAGConfig) -> StateGraph:
     return graph.compile()
 
 
+# Compiled graphs are immutable, so one instance can serve every invocation.
+_parent_graph_cache: dict = {}
+_parent_graph_lock = threading.Lock()
+
+
+def get_parent_graph(llm: ChatOpenAI, rag_config: RAGConfig) -> StateGraph:
+    """Return the compiled parent graph, building it only once.
+
+    The graph is cached for the most recent ``(llm, rag_config)`` pair,
+    compared by identity. References to both objects are kept alongside
+    the graph so their ids cannot be recycled while cached.
+
+    Args:
+        llm: Language model for agents
+        rag_config: Configuration for RAG subgraph
+
+    Returns:
+        Compiled parent graph
+    """
+    key = (id(llm), id(rag_config))
+    with _parent_graph_lock:
+        cached = _parent_graph_cache.get(key)
+        if cached is None:
+            _parent_graph_cache.clear()
+            cached = (llm, rag_config, build_parent_graph(llm, rag_config))
+            _parent_graph_cache[key] = cached
+        return cached[2]
+
+
 # ============================================================================
 # Main Execution
 # ============================================================================
 
-def main():
+def _print_result(question: str, result) -> None:
+    """Print the outcome of a single demo question."""
+    print(f"\n{'='*80}")
+    print(f"User Question: {question}")
+    print(f"{'='*80}")
+
+    if isinstance(result, Exception):
+        print(f"\n[Error] {str(result)}")
+        return
+
+    # Extract response
+    if result.get('messages'):
+        final_message = result['messages'][-1]
+        response = final_message.content if hasattr(final_message, 'content') else str(final_message)
+        print(f"\n[Final Response]\n{response}")
+    else:
+        print("\n[Error] No response generated")
+
+
+async def main():
     """Run the parent multi-agent system."""
     load_dotenv()
 
@@ -224,22 +604,35 @@ def main():
     rag_config = RAGConfig.from_env()
     rag_config.validate()
 
-    # Create LLM
+    # Create LLM. Both clients live for the whole run so concurrent calls
+    # share pooled connections; the async one multiplexes over HTTP/2.
+    timeout = httpx.Timeout(120.0, connect=10.0)
+    limits = httpx.Limits(max_keepalive_connections=64, max_connections=128)
     client = httpx.Client(
         verify=rag_config.verify_ssl,
         follow_redirects=True,
-        timeout=httpx.Timeout(120.0, connect=10.0)
+        timeout=timeout,
+        limits=limits
+    )
+    async_client = httpx.AsyncClient(
+        http2=True,
+        verify=rag_config.verify_ssl,
+        follow_redirects=True,
+        timeout=timeout,
+        limits=limits
     )
     llm = ChatOpenAI(
         model=rag_config.chat_model,
         openai_api_key=rag_config.embed_api_key,
         openai_api_base=rag_config.embed_api_base,
         temperature=0,
-        http_client=client
+        service_tier=rag_config.service_tier,
+        http_client=client,
+        http_async_client=async_client
     )
 
-    # Build parent graph
-    parent_graph = build_parent_graph(llm, rag_config)
+    # Build (or reuse) the compiled parent graph
+    parent_graph = get_parent_graph(llm, rag_config)
 
     # Test questions for different agents
     test_questions = [
@@ -253,32 +646,29 @@ def main():
     print("PARENT MULTI-AGENT SYSTEM - DEMO")
     print("="*80)
 
-    for question in test_questions:
-        print(f"\n{'='*80}")
-        print(f"User Question: {question}")
-        print(f"{'='*80}")
-
-        # Initialize state
-        initial_state = {
+    # Initialize one state per question
+    initial_states = [
+        {
             "messages": [HumanMessage(content=question)],
             "current_agent": "",
             "task_type": ""
         }
+        for question in test_questions
+    ]
 
-        # Run graph
-        try:
-            final_state = parent_graph.invoke(initial_state)
-
-            # Extract response
-            if final_state.get('messages'):
-                final_message = final_state['messages'][-1]
-                response = final_message.content if hasattr(final_message, 'content') else str(final_message)
-                print(f"\n[Final Response]\n{response}")
-            else:
-                print("\n[Error] No response generated")
+    # Run all questions concurrently; each one is dominated by LLM latency
+    try:
+        final_states = await parent_graph.abatch(
+            initial_states,
+            config={"max_concurrency": 8},
+            return_exceptions=True
+        )
+    finally:
+        await async_client.aclose()
+        client.close()
 
-        except Exception as e:
-            print(f"\n[Error] {str(e)}")
+    for question, result in zip(test_questions, final_states):
+        _print_result(question, result)
 
     print("\n" + "="*80)
     print("DEMO COMPLETED")
@@ -286,4 +676,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
@@ -21,8 +21,8 @@ Usage:
     from rag_system.query import RagApplication
 """
 
-from .common import log, set_quiet_mode, LocalApiEmbeddings
+from .common import log, log_error, log_debug, flush_logs, set_quiet_mode, LocalApiEmbeddings
 
 __version__ = "2.0.0"
 __author__ = "RAG System Team"
-__all__ = ["log", "set_quiet_mode", "LocalApiEmbeddings"]
\ No newline at end of file
+__all__ = ["log", "log_error", "log_debug", "flush_logs", "set_quiet_mode", "LocalApiEmbeddings"]
\ No newline at end of file
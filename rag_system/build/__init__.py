@@ -22,6 +22,12 @@ def __getattr__(name):
     elif name == "chunk_document_law":
         from .chunking import chunk_document_law
         return chunk_document_law
+    elif name == "chunk_corpus":
+        from .chunking import chunk_corpus
+        return chunk_corpus
+    elif name == "iter_chunk_corpus":
+        from .chunking import iter_chunk_corpus
+        return iter_chunk_corpus
     elif name == "indexer_main":
         from .indexer import main as indexer_main
         return indexer_main
@@ -34,6 +40,8 @@ __all__ = [
     "preprocess_main",
     "chunk_document_general",
     "chunk_document_law",
+    "chunk_corpus",
+    "iter_chunk_corpus",
     "indexer_main",
     "export_main"
 ]
\ No newline at end of file
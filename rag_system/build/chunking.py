@@ -1,12 +1,16 @@
 
+import os
 import re
 import uuid
+from collections import deque
+from functools import lru_cache, wraps
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Iterator, Optional, Sequence, Tuple
 
 from langchain.text_splitter import RecursiveCharacterTextSplitter, TextSplitter
 
-from ..common import log
+from ..common import log_debug, flush_logs
 
 # Regex patterns for different Chinese legal document structures
 # Exclude placeholder patterns like 第○○條, 第○條 (used in examples)
@@ -15,6 +19,16 @@ _RE_CHAPTER = re.compile(r"^(第\s*[一二三四五六七八九十百千零〇
 _RE_NUMBERED_ITEM = re.compile(r"^([一二三四五六七八九十百千]+、)", re.MULTILINE)  # 一、二、
 _RE_SUBITEM = re.compile(r"^(（[一二三四五六七八九十百千]+）)", re.MULTILINE)  # （一）（二）
 
+# All primary markers in one alternation so a document is scanned only once;
+# the named group of each match tells which marker type it is. The patterns
+# above are reused (minus their leading "^") so the two never drift apart.
+_RE_LAW_MARKERS = re.compile(
+    rf"^(?:(?P<article>{_RE_ARTICLE.pattern[1:]})"
+    rf"|(?P<chapter>{_RE_CHAPTER.pattern[1:]})"
+    rf"|(?P<item>{_RE_NUMBERED_ITEM.pattern[1:]}))",
+    re.MULTILINE
+)
+
 # Basic text cleaning regex
 _RE_MULTI_SPACE = re.compile(r"[ \t\u3000]+")
 _RE_MULTI_NL = re.compile(r"\n{3,}")
@@ -23,41 +37,124 @@ _RE_MULTI_NL = re.compile(r"\n{3,}")
 _RE_LATEX_DISPLAY = re.compile(r'\$\$[^$]+?\$\$', re.DOTALL)  # Display math: $$...$$
 _RE_LATEX_INLINE = re.compile(r'\$[^$\n]+?\$')  # Inline math: $...$
 
+def _latex_spans(s: str) -> Iterator[Tuple[int, int]]:
+    """Yields (start, end) spans of LaTeX math in order, display math taking precedence."""
+    pos = 0
+    for match in _RE_LATEX_DISPLAY.finditer(s):
+        # Inline math can only occur in the gaps between display blocks
+        for inline in _RE_LATEX_INLINE.finditer(s, pos, match.start()):
+            yield inline.span()
+        yield match.span()
+        pos = match.end()
+    for inline in _RE_LATEX_INLINE.finditer(s, pos):
+        yield inline.span()
+
+def _clean_segment(s: str) -> str:
+    """Applies standard text cleaning to a segment containing no LaTeX."""
+    s = s.replace("\r", "")
+    s = _RE_MULTI_SPACE.sub(" ", s)
+    return _RE_MULTI_NL.sub("\n\n", s)
+
 def clean_text(s: str) -> str:
     """
     Basic cleaning: collapses whitespace and normalizes newlines.
     Preserves LaTeX math expressions ($...$ and $$...$$).
-    """
-    # Step 1: Extract and replace LaTeX expressions with placeholders
-    latex_blocks = []
-    def save_latex(match):
-        latex_blocks.append(match.group(0))
-        return f"__LATEX_{len(latex_blocks)-1}__"
-
-    # Protect display math first (to avoid conflicts with inline math)
-    s = _RE_LATEX_DISPLAY.sub(save_latex, s)
-    s = _RE_LATEX_INLINE.sub(save_latex, s)
-
-    # Step 2: Apply standard text cleaning
-    s = s.replace("\r", "").strip()
-    s = _RE_MULTI_SPACE.sub(" ", s)
-    s = _RE_MULTI_NL.sub("\n\n", s)
-
-    # Step 3: Restore LaTeX expressions
-    for i, block in enumerate(latex_blocks):
-        s = s.replace(f"__LATEX_{i}__", block)
 
-    return s
-
-def get_law_text_splitter(max_chars: int, overlap: int) -> TextSplitter:
-    """Returns a text splitter suitable for splitting content within a law article."""
+    The text is walked once: segments between LaTeX spans are cleaned and
+    LaTeX spans are copied through untouched, then everything is joined.
+    """
+    parts = []
+    pos = 0
+    for start, end in _latex_spans(s):
+        parts.append(_clean_segment(s[pos:start]))
+        parts.append(s[start:end])
+        pos = end
+    parts.append(_clean_segment(s[pos:]))
+
+    # Strip only the outer ends of the document, never inside LaTeX
+    parts[0] = parts[0].lstrip()
+    parts[-1] = parts[-1].rstrip()
+    return "".join(parts)
+
+@lru_cache(maxsize=16)
+def _get_general_text_splitter(max_chars: int, overlap: int) -> TextSplitter:
+    """Returns a (cached) general-purpose recursive text splitter."""
     return RecursiveCharacterTextSplitter(
         chunk_size=max_chars,
         chunk_overlap=overlap,
         length_function=len,
-        separators=["\n\n", "\n", " ", ""],  # Split by paragraph first
+        separators=["\n\n", "\n", ". ", " ", ""], # Common separators
     )
 
+def _iter_pieces(text: str, max_chars: int) -> Iterator[Tuple[str, str]]:
+    """
+    Yields (separator, piece) pairs covering text, each piece at most max_chars long.
+
+    Paragraphs are preferred, then lines; only a single line longer than
+    max_chars is cut into fixed-size character windows.
+    """
+    for i, para in enumerate(text.split("\n\n")):
+        para_sep = "\n\n" if i else ""
+        if len(para) <= max_chars:
+            yield para_sep, para
+            continue
+        for j, line in enumerate(para.split("\n")):
+            line_sep = "\n" if j else para_sep
+            if len(line) <= max_chars:
+                yield line_sep, line
+                continue
+            for k in range(0, len(line), max_chars):
+                yield (line_sep if k == 0 else ""), line[k:k + max_chars]
+
+def _fast_split(text: str, max_chars: int, overlap: int) -> List[str]:
+    """
+    Single-pass greedy splitter for law bodies.
+
+    Accumulates paragraphs (or lines) into a buffer and emits it whenever the
+    next piece would push it past max_chars. The last `overlap` characters of
+    an emitted chunk are carried into the next one when they fit.
+    """
+    chunks = []
+    buf = ""
+    for sep, piece in _iter_pieces(text, max_chars):
+        if not piece.strip():
+            continue
+        if not buf:
+            buf = piece
+        elif len(buf) + len(sep) + len(piece) <= max_chars:
+            buf = f"{buf}{sep}{piece}"
+        else:
+            chunks.append(buf.strip())
+            carry = buf[-overlap:] if overlap > 0 else ""
+            if carry and len(carry) + len(sep) + len(piece) <= max_chars:
+                buf = f"{carry}{sep}{piece}"
+            else:
+                buf = piece
+    if buf.strip():
+        chunks.append(buf.strip())
+    return chunks
+
+def _flush_logs_after(fn):
+    """Emits the log lines queued while chunking a document in one write."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            flush_logs()
+    return wrapper
+
+def _read_document(doc_path: Path) -> str:
+    """
+    Reads a document as UTF-8 text.
+
+    The file is read as bytes in one call and decoded once; undecodable bytes
+    are replaced instead of aborting the whole document.
+    """
+    with open(doc_path, 'rb') as f:
+        return f.read().decode('utf-8', errors='replace')
+
+@_flush_logs_after
 def chunk_document_law(doc_path: Path, max_chars: int, overlap: int) -> List[Dict]:
     """
     Splits a preprocessed Markdown file based on Chinese legal document structures.
@@ -67,33 +164,59 @@ def chunk_document_law(doc_path: Path, max_chars: int, overlap: int) -> List[Dic
     2. 第X章 (chapters) - medium priority
     3. 一、二、三、 (numbered items) - for notices/guidelines
     """
-    log(f"  - Splitting {doc_path.name} with 'law' strategy...")
+    log_debug(lambda: f"  - Splitting {doc_path.name} with 'law' strategy...")
     try:
-        full_text = doc_path.read_text(encoding='utf-8')
+        full_text = _read_document(doc_path)
     except FileNotFoundError:
-        log(f"    - ERROR: File not found: {doc_path}")
+        log_debug(lambda: f"    - ERROR: File not found: {doc_path}")
         return []
 
-    # Try different marker types in priority order
-    article_spans = list(_RE_ARTICLE.finditer(full_text))
+    # Scan once, bucketing markers by type, then use them in priority order
+    buckets = {"article": [], "chapter": [], "item": []}
+    for match in _RE_LAW_MARKERS.finditer(full_text):
+        buckets[match.lastgroup].append(match)
+
+    article_spans = buckets["article"]
     if article_spans:
-        log(f"    - Found {len(article_spans)} '第X條' markers")
+        log_debug(lambda: f"    - Found {len(article_spans)} '第X條' markers")
         return _chunk_by_markers(full_text, article_spans, doc_path.name, max_chars, overlap, "article")
 
-    chapter_spans = list(_RE_CHAPTER.finditer(full_text))
+    chapter_spans = buckets["chapter"]
     if chapter_spans:
-        log(f"    - Found {len(chapter_spans)} '第X章' markers, using as primary structure")
+        log_debug(lambda: f"    - Found {len(chapter_spans)} '第X章' markers, using as primary structure")
         # Also detect numbered items within chapters
         return _chunk_by_chapters_with_items(full_text, chapter_spans, doc_path.name, max_chars, overlap)
 
-    numbered_spans = list(_RE_NUMBERED_ITEM.finditer(full_text))
+    numbered_spans = buckets["item"]
     if numbered_spans:
-        log(f"    - Found {len(numbered_spans)} '一、' style markers")
+        log_debug(lambda: f"    - Found {len(numbered_spans)} '一、' style markers")
         return _chunk_by_markers(full_text, numbered_spans, doc_path.name, max_chars, overlap, "item")
 
-    log(f"    - No structural markers found in {doc_path.name}. Falling back to general splitting.")
+    log_debug(lambda: f"    - No structural markers found in {doc_path.name}. Falling back to general splitting.")
     return chunk_document_general(doc_path, max_chars, overlap)
 
+def _batch_uuids(n: int) -> List[str]:
+    """Generates n random (version 4) UUID strings from a single os.urandom call."""
+    buf = os.urandom(16 * n)
+    return [str(uuid.UUID(bytes=buf[i:i + 16], version=4)) for i in range(0, 16 * n, 16)]
+
+def _build_law_records(sections: List[Tuple[str, str, int]], source_name: str) -> List[Dict]:
+    """
+    Turns (content, article, article_chunk_seq) tuples into chunk records.
+
+    IDs for the whole document are allocated in one batch instead of one
+    uuid4() call per chunk.
+    """
+    ids = _batch_uuids(len(sections))
+    return [{
+        "id": chunk_id,
+        "content": content,
+        "source": source_name,
+        "page": 1,
+        "article": article,
+        "article_chunk_seq": seq
+    } for chunk_id, (content, article, seq) in zip(ids, sections)]
+
 def _chunk_by_markers(full_text: str, markers: List, source_name: str, max_chars: int, overlap: int, marker_type: str) -> List[Dict]:
     """
     Generic chunking function for any type of structural markers.
@@ -106,12 +229,11 @@ def _chunk_by_markers(full_text: str, markers: List, source_name: str, max_chars
         overlap: Overlap between chunks
         marker_type: Type of marker ("article", "chapter", "item")
     """
-    chunks = []
-    text_splitter = get_law_text_splitter(max_chars, overlap)
+    sections = []
 
     for i, match in enumerate(markers):
-        marker_title = match.group(1).strip()
-        content_start_pos = match.end(1)
+        marker_title = match.group().strip()
+        content_start_pos = match.end()
         end_pos = markers[i + 1].start() if i + 1 < len(markers) else len(full_text)
 
         marker_body = full_text[content_start_pos:end_pos].strip()
@@ -120,30 +242,15 @@ def _chunk_by_markers(full_text: str, markers: List, source_name: str, max_chars
 
         # If the whole section fits, keep it as one chunk
         if len(marker_title) + len(marker_body) + 2 <= max_chars:
-            content = f"{marker_title}\n\n{marker_body}"
-            chunks.append({
-                "id": str(uuid.uuid4()),
-                "content": content,
-                "source": source_name,
-                "page": 1,
-                "article": marker_title,
-                "article_chunk_seq": 1
-            })
+            sections.append((f"{marker_title}\n\n{marker_body}", marker_title, 1))
         else:
             # If too long, split the body and prepend the title to each chunk
-            body_chunks = text_splitter.split_text(marker_body)
+            body_chunks = _fast_split(marker_body, max_chars, overlap)
             for k, part in enumerate(body_chunks):
-                content = f"{marker_title}\n\n{part}"
-                chunks.append({
-                    "id": str(uuid.uuid4()),
-                    "content": content,
-                    "source": source_name,
-                    "page": 1,
-                    "article": marker_title,
-                    "article_chunk_seq": k + 1
-                })
-
-    log(f"    - Chunked {len(markers)} {marker_type}s into {len(chunks)} chunks.")
+                sections.append((f"{marker_title}\n\n{part}", marker_title, k + 1))
+
+    chunks = _build_law_records(sections, source_name)
+    log_debug(lambda: f"    - Chunked {len(markers)} {marker_type}s into {len(chunks)} chunks.")
     return chunks
 
 def _chunk_by_chapters_with_items(full_text: str, chapter_spans: List, source_name: str, max_chars: int, overlap: int) -> List[Dict]:
@@ -152,39 +259,24 @@ def _chunk_by_chapters_with_items(full_text: str, chapter_spans: List, source_na
 
     Strategy: Use chapters as primary structure, then detect numbered items within each chapter.
     """
-    chunks = []
-    text_splitter = get_law_text_splitter(max_chars, overlap)
+    sections = []
 
     # Handle preamble content (before first chapter)
     if chapter_spans:
         preamble = full_text[:chapter_spans[0].start()].strip()
         if preamble:
-            log(f"    - Found preamble content ({len(preamble)} chars), preserving as metadata chunk")
+            log_debug(lambda: f"    - Found preamble content ({len(preamble)} chars), preserving as metadata chunk")
             if len(preamble) <= max_chars:
-                chunks.append({
-                    "id": str(uuid.uuid4()),
-                    "content": preamble,
-                    "source": source_name,
-                    "page": 1,
-                    "article": "前言",
-                    "article_chunk_seq": 1
-                })
+                sections.append((preamble, "前言", 1))
             else:
                 # Split long preamble
-                preamble_parts = text_splitter.split_text(preamble)
+                preamble_parts = _fast_split(preamble, max_chars, overlap)
                 for k, part in enumerate(preamble_parts):
-                    chunks.append({
-                        "id": str(uuid.uuid4()),
-                        "content": part,
-                        "source": source_name,
-                        "page": 1,
-                        "article": "前言",
-                        "article_chunk_seq": k + 1
-                    })
+                    sections.append((part, "前言", k + 1))
 
     for i, chapter_match in enumerate(chapter_spans):
-        chapter_title = chapter_match.group(1).strip()
-        chapter_start = chapter_match.end(1)
+        chapter_title = chapter_match.group().strip()
+        chapter_start = chapter_match.end()
         chapter_end = chapter_spans[i + 1].start() if i + 1 < len(chapter_spans) else len(full_text)
         chapter_text = full_text[chapter_start:chapter_end].strip()
 
@@ -196,10 +288,10 @@ def _chunk_by_chapters_with_items(full_text: str, chapter_spans: List, source_na
 
         if item_spans and len(item_spans) >= 2:
             # Chapter has structured items, split by them
-            log(f"    - Chapter '{chapter_title}' has {len(item_spans)} numbered items")
+            log_debug(lambda: f"    - Chapter '{chapter_title}' has {len(item_spans)} numbered items")
             for j, item_match in enumerate(item_spans):
-                item_title = item_match.group(1).strip()
-                item_start = item_match.end(1)
+                item_title = item_match.group().strip()
+                item_start = item_match.end()
                 item_end = item_spans[j + 1].start() if j + 1 < len(item_spans) else len(chapter_text)
                 item_body = chapter_text[item_start:item_end].strip()
 
@@ -210,77 +302,122 @@ def _chunk_by_chapters_with_items(full_text: str, chapter_spans: List, source_na
                 combined_content = f"{full_item_title}\n\n{item_body}"
 
                 if len(combined_content) <= max_chars:
-                    chunks.append({
-                        "id": str(uuid.uuid4()),
-                        "content": combined_content,
-                        "source": source_name,
-                        "page": 1,
-                        "article": full_item_title,
-                        "article_chunk_seq": 1
-                    })
+                    sections.append((combined_content, full_item_title, 1))
                 else:
                     # Split long item content
-                    body_parts = text_splitter.split_text(item_body)
+                    body_parts = _fast_split(item_body, max_chars, overlap)
                     for k, part in enumerate(body_parts):
-                        chunks.append({
-                            "id": str(uuid.uuid4()),
-                            "content": f"{full_item_title}\n\n{part}",
-                            "source": source_name,
-                            "page": 1,
-                            "article": full_item_title,
-                            "article_chunk_seq": k + 1
-                        })
+                        sections.append((f"{full_item_title}\n\n{part}", full_item_title, k + 1))
         else:
             # Chapter has no structured items, treat as single unit
             combined = f"{chapter_title}\n\n{chapter_text}"
             if len(combined) <= max_chars:
-                chunks.append({
-                    "id": str(uuid.uuid4()),
-                    "content": combined,
-                    "source": source_name,
-                    "page": 1,
-                    "article": chapter_title,
-                    "article_chunk_seq": 1
-                })
+                sections.append((combined, chapter_title, 1))
             else:
-                parts = text_splitter.split_text(chapter_text)
+                parts = _fast_split(chapter_text, max_chars, overlap)
                 for k, part in enumerate(parts):
-                    chunks.append({
-                        "id": str(uuid.uuid4()),
-                        "content": f"{chapter_title}\n\n{part}",
-                        "source": source_name,
-                        "page": 1,
-                        "article": chapter_title,
-                        "article_chunk_seq": k + 1
-                    })
-
-    log(f"    - Processed {len(chapter_spans)} chapters into {len(chunks)} chunks")
+                    sections.append((f"{chapter_title}\n\n{part}", chapter_title, k + 1))
+
+    chunks = _build_law_records(sections, source_name)
+    log_debug(lambda: f"    - Processed {len(chapter_spans)} chapters into {len(chunks)} chunks")
     return chunks
 
+@_flush_logs_after
 def chunk_document_general(doc_path: Path, max_chars: int, overlap: int) -> List[Dict]:
     """Splits a preprocessed Markdown file using a general-purpose recursive text splitter."""
-    log(f"  - Splitting {doc_path.name} with 'general' strategy...")
+    log_debug(lambda: f"  - Splitting {doc_path.name} with 'general' strategy...")
     try:
-        full_text = doc_path.read_text(encoding='utf-8')
+        full_text = _read_document(doc_path)
     except FileNotFoundError:
-        log(f"    - ERROR: File not found: {doc_path}")
+        log_debug(lambda: f"    - ERROR: File not found: {doc_path}")
         return []
 
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=max_chars,
-        chunk_overlap=overlap,
-        length_function=len,
-        separators=["\n\n", "\n", ". ", " ", ""], # Common separators
-    )
+    parts = _get_general_text_splitter(max_chars, overlap).split_text(full_text)
+    source_name = str(doc_path.name)
 
-    parts = text_splitter.split_text(full_text)
-    
     chunks = [{
-        "id": str(uuid.uuid4()), 
-        "content": part, 
-        "source": str(doc_path.name), 
+        "id": chunk_id,
+        "content": part,
+        "source": source_name,
         "page": 1, # Page info is 1 for single MD file
         "chunk_seq": i + 1
-    } for i, part in enumerate(parts)]
-    log(f"    - Split into {len(chunks)} chunks.")
+    } for i, (chunk_id, part) in enumerate(zip(_batch_uuids(len(parts)), parts))]
+    log_debug(lambda: f"    - Split into {len(chunks)} chunks.")
     return chunks
+
+def _chunk_one(job: Tuple[Path, int, int, str]) -> List[Dict]:
+    """Process pool worker: chunks a single document with the given strategy."""
+    doc_path, max_chars, overlap, strategy = job
+    if strategy == "law":
+        return chunk_document_law(doc_path, max_chars, overlap)
+    return chunk_document_general(doc_path, max_chars, overlap)
+
+def iter_chunk_corpus(
+    doc_paths: Sequence[Path],
+    max_chars: int,
+    overlap: int,
+    strategies: Optional[Sequence[str]] = None,
+    max_workers: Optional[int] = None
+) -> Iterator[List[Dict]]:
+    """
+    Chunks many documents in a process pool, yielding results in input order.
+
+    Only a small window of documents is in flight at once, so a caller that
+    embeds each yielded document overlaps that work with chunking the next
+    ones without holding the whole corpus in memory.
+
+    Args:
+        doc_paths: Documents to chunk
+        max_chars: Maximum characters per chunk
+        overlap: Overlap between chunks
+        strategies: Per-document strategy ("law" or "general"); defaults to "law"
+        max_workers: Number of worker processes (default: CPU count)
+
+    Yields:
+        One chunk list per document, in the same order as doc_paths
+    """
+    if strategies is None:
+        strategies = ["law"] * len(doc_paths)
+    if len(strategies) != len(doc_paths):
+        raise ValueError("strategies must have the same length as doc_paths")
+
+    jobs = [(Path(p), max_chars, overlap, s) for p, s in zip(doc_paths, strategies)]
+    if len(jobs) <= 1 or max_workers == 1:
+        for job in jobs:
+            yield _chunk_one(job)
+        return
+
+    window = 2 * (max_workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        for job in jobs:
+            pending.append(executor.submit(_chunk_one, job))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def chunk_corpus(
+    doc_paths: Sequence[Path],
+    max_chars: int,
+    overlap: int,
+    strategies: Optional[Sequence[str]] = None,
+    max_workers: Optional[int] = None
+) -> List[List[Dict]]:
+    """
+    Chunks many documents in parallel across CPU cores.
+
+    Chunking is CPU-bound (regex scanning and text splitting), so files are
+    fanned out to a process pool. Each worker builds its own text splitters.
+
+    Args:
+        doc_paths: Documents to chunk
+        max_chars: Maximum characters per chunk
+        overlap: Overlap between chunks
+        strategies: Per-document strategy ("law" or "general"); defaults to "law"
+        max_workers: Number of worker processes (default: CPU count)
+
+    Returns:
+        One chunk list per document, in the same order as doc_paths
+    """
+    return list(iter_chunk_corpus(doc_paths, max_chars, overlap, strategies, max_workers))
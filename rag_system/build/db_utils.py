@@ -1,15 +1,65 @@
 
+import io
+import struct
+import threading
+import time
+import uuid
+from contextlib import contextmanager
 import psycopg2
-from typing import List
+import psycopg2.extras
+import psycopg2.pool
+import numpy as np
+import orjson
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
 from ..common import log
 
+# One connection pool per connection string, shared by all helpers below.
+# ThreadedConnectionPool raises PoolError once maxconn connections are out,
+# so each pool is paired with a semaphore that makes extra callers wait.
+_POOL_MAXCONN = 8
+_POOLS: Dict[str, Tuple[psycopg2.pool.ThreadedConnectionPool, threading.BoundedSemaphore]] = {}
+_POOLS_LOCK = threading.Lock()
+
+def _get_pool(conn_str: str) -> Tuple[psycopg2.pool.ThreadedConnectionPool, threading.BoundedSemaphore]:
+    """Returns the (lazily created) connection pool and its checkout semaphore for a connection string."""
+    # The psycopg2 driver doesn't need the 'postgresql+psycopg2' scheme.
+    clean_conn_str = conn_str.replace("postgresql+psycopg2://", "postgresql://")
+    with _POOLS_LOCK:
+        entry = _POOLS.get(clean_conn_str)
+        if entry is None:
+            pool = psycopg2.pool.ThreadedConnectionPool(1, _POOL_MAXCONN, clean_conn_str)
+            entry = _POOLS[clean_conn_str] = (pool, threading.BoundedSemaphore(_POOL_MAXCONN))
+        return entry
+
+# get_collection_stats results per connection string, as (fetched_at, stats)
+_STATS_TTL = 30.0
+_STATS_CACHE: Dict[str, Tuple[float, List[dict]]] = {}
+_STATS_LOCK = threading.Lock()
+
+# Connection strings ensure_collection_index has already run against
+_COLLECTION_INDEXED: Set[str] = set()
+
+def _invalidate_stats():
+    """Drops cached collection stats after this process changes the tables."""
+    with _STATS_LOCK:
+        _STATS_CACHE.clear()
+
+@contextmanager
+def _pooled_connection(conn_str: str) -> Iterator["psycopg2.extensions.connection"]:
+    """Borrows a pooled connection, waiting while all are in use; commits on success and rolls back on error."""
+    pool, slots = _get_pool(conn_str)
+    with slots:
+        conn = pool.getconn()
+        try:
+            with conn:
+                yield conn
+        finally:
+            pool.putconn(conn, close=bool(conn.closed))
+
 def ensure_pgvector(conn_str: str):
     """Ensures the vector extension is created in the database."""
     try:
-        # The psycopg2 driver doesn't need the 'postgresql+psycopg2' scheme.
-        clean_conn_str = conn_str.replace("postgresql+psycopg2://", "postgresql://")
-        with psycopg2.connect(clean_conn_str) as conn:
-            conn.autocommit = True
+        with _pooled_connection(conn_str) as conn:
             with conn.cursor() as cur:
                 cur.execute("CREATE EXTENSION IF NOT EXISTS vector;")
                 log("Ensured 'vector' extension exists.")
@@ -20,21 +70,40 @@ def ensure_pgvector(conn_str: str):
     except Exception as e:
         log(f"An unexpected error occurred while ensuring vector extension: {e}")
 
+def ensure_collection_index(conn_str: str):
+    """Ensures the collection_id index that lets the stats query count via an index-only scan.
+
+    Called from the build path once the tables exist; attempted once per
+    process and connection string, whether or not it succeeds.
+    """
+    if conn_str in _COLLECTION_INDEXED:
+        return
+    _COLLECTION_INDEXED.add(conn_str)
+    try:
+        with _pooled_connection(conn_str) as conn:
+            with conn.cursor() as cur:
+                cur.execute("CREATE INDEX IF NOT EXISTS idx_embedding_collection_id ON langchain_pg_embedding (collection_id);")
+    except psycopg2.Error as e:
+        log(f"Could not ensure collection_id index: {e}")
+
 def wipe_collection(conn_str: str, name: str):
     """Deletes all data associated with a specific collection name."""
     try:
-        clean_conn_str = conn_str.replace("postgresql+psycopg2://", "postgresql://")
-        with psycopg2.connect(clean_conn_str) as conn:
+        with _pooled_connection(conn_str) as conn:
             with conn.cursor() as cur:
-                # Find the collection UUID from its name.
-                cur.execute("SELECT uuid FROM langchain_pg_collection WHERE name = %s;", (name,))
-                collection_id = cur.fetchone()
-                
-                if collection_id:
-                    # Delete embeddings associated with the collection.
-                    cur.execute("DELETE FROM langchain_pg_embedding WHERE collection_id = %s;", (collection_id[0],))
-                    # Delete the collection itself.
-                    cur.execute("DELETE FROM langchain_pg_collection WHERE uuid = %s;", (collection_id[0],))
+                # Delete the embeddings and the collection itself in one round trip.
+                cur.execute("""
+                    WITH del_c AS (
+                        SELECT uuid FROM langchain_pg_collection WHERE name = %s
+                    ), del_e AS (
+                        DELETE FROM langchain_pg_embedding WHERE collection_id IN (SELECT uuid FROM del_c)
+                    )
+                    DELETE FROM langchain_pg_collection WHERE uuid IN (SELECT uuid FROM del_c)
+                    RETURNING uuid;
+                """, (name,))
+
+                if cur.fetchone():
+                    _invalidate_stats()
                     log(f"Successfully reset collection '{name}'.")
                 else:
                     log(f"Collection '{name}' not found, no need to reset.")
@@ -47,8 +116,7 @@ def get_collection_names(conn_str: str) -> List[str]:
     """Fetches the names of all existing collections from the database."""
     collections = []
     try:
-        clean_conn_str = conn_str.replace("postgresql+psycopg2://", "postgresql://")
-        with psycopg2.connect(clean_conn_str) as conn:
+        with _pooled_connection(conn_str) as conn:
             with conn.cursor() as cur:
                 cur.execute("SELECT name FROM langchain_pg_collection;")
                 rows = cur.fetchall()
@@ -57,19 +125,26 @@ def get_collection_names(conn_str: str) -> List[str]:
         log(f"Database error while fetching collection names: {e}")
     return collections
 
-def get_collection_stats(conn_str: str) -> List[dict]:
+def get_collection_stats(conn_str: str, max_age: float = _STATS_TTL) -> List[dict]:
     """Fetches statistics for all collections including document counts.
 
+    Results are cached for max_age seconds, since callers such as the design
+    area router poll this on every query.
+
     Returns:
         List of dicts with 'name' and 'doc_count' keys
     """
+    with _STATS_LOCK:
+        cached = _STATS_CACHE.get(conn_str)
+    if cached and time.monotonic() - cached[0] < max_age:
+        return [dict(s) for s in cached[1]]
+
     stats = []
     try:
-        clean_conn_str = conn_str.replace("postgresql+psycopg2://", "postgresql://")
-        with psycopg2.connect(clean_conn_str) as conn:
+        with _pooled_connection(conn_str) as conn:
             with conn.cursor() as cur:
                 cur.execute("""
-                    SELECT c.name, COUNT(e.id) as doc_count
+                    SELECT c.name, COUNT(e.collection_id) as doc_count
                     FROM langchain_pg_collection c
                     LEFT JOIN langchain_pg_embedding e ON c.uuid = e.collection_id
                     GROUP BY c.name
@@ -77,35 +152,207 @@ def get_collection_stats(conn_str: str) -> List[dict]:
                 """)
                 rows = cur.fetchall()
                 stats = [{"name": name, "doc_count": count} for name, count in rows]
+        with _STATS_LOCK:
+            _STATS_CACHE[conn_str] = (time.monotonic(), stats)
+        stats = [dict(s) for s in stats]
     except psycopg2.Error as e:
         log(f"Database error while fetching collection stats: {e}")
     return stats
 
-def delete_all_collections(conn_str: str):
-    """Deletes all langchain_pg collections from the database."""
-    from langchain_postgres import PGVector
-    from langchain_core.embeddings import FakeEmbeddings
+def get_collection_uuid(conn_str: str, name: str) -> Optional[str]:
+    """Returns the UUID of a collection by name, or None if it does not exist."""
+    try:
+        with _pooled_connection(conn_str) as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT uuid FROM langchain_pg_collection WHERE name = %s;", (name,))
+                row = cur.fetchone()
+                return str(row[0]) if row else None
+    except psycopg2.Error as e:
+        log(f"Database error while fetching collection '{name}': {e}")
+    return None
+
+def get_existing_ids(conn_str: str, collection_id: str, ids: Sequence[str], model: str) -> Set[str]:
+    """Returns the subset of the given IDs already embedded in this collection with this model.
+
+    Rows stored by another collection or model (recorded in the chunk's
+    'embedding_model' metadata) don't count, so they get re-embedded.
+    """
+    if not ids:
+        return set()
+    try:
+        with _pooled_connection(conn_str) as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT id FROM langchain_pg_embedding
+                    WHERE collection_id = %s AND id = ANY(%s) AND cmetadata->>'embedding_model' = %s;
+                """, (collection_id, list(ids), model))
+                return {row[0] for row in cur.fetchall()}
+    except psycopg2.Error as e:
+        log(f"Database error while checking existing embeddings: {e}")
+    return set()
+
+def insert_embeddings(
+    conn_str: str,
+    collection_id: str,
+    ids: Sequence[str],
+    texts: Sequence[str],
+    embeddings: Sequence[Sequence[float]],
+    metadatas: Sequence[dict],
+    page_size: int = 500
+) -> int:
+    """Bulk-inserts embedding rows with multi-row INSERT statements.
+
+    Rows are sent through psycopg2.extras.execute_values, one statement per
+    page_size rows. Existing IDs are overwritten (collection, vector, text and
+    metadata), matching PGVector.add_texts' upsert behaviour.
 
+    Returns:
+        Number of rows submitted
+    """
+    # One row per ID (last wins, as with successive upserts): a single
+    # ON CONFLICT DO UPDATE statement may not touch the same row twice
+    rows = list({
+        chunk_id: (chunk_id, collection_id, orjson.dumps(vector, option=orjson.OPT_SERIALIZE_NUMPY).decode(), text, orjson.dumps(metadata).decode())
+        for chunk_id, text, vector, metadata in zip(ids, texts, embeddings, metadatas)
+    }.values())
+    with _pooled_connection(conn_str) as conn:
+        with conn.cursor() as cur:
+            psycopg2.extras.execute_values(
+                cur,
+                "INSERT INTO langchain_pg_embedding (id, collection_id, embedding, document, cmetadata) "
+                "VALUES %s ON CONFLICT (id) DO UPDATE SET "
+                "collection_id = EXCLUDED.collection_id, embedding = EXCLUDED.embedding, "
+                "document = EXCLUDED.document, cmetadata = EXCLUDED.cmetadata",
+                rows,
+                template="(%s, %s, %s::vector, %s, %s::jsonb)",
+                page_size=page_size,
+            )
+    _invalidate_stats()
+    return len(rows)
+
+# PostgreSQL binary COPY framing: signature, flags, header extension length
+_COPY_BINARY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+_COPY_BINARY_TRAILER = struct.pack("!h", -1)
+_COPY_ROW_FIELDS = struct.pack("!h", 5)
+
+def _copy_field(data: bytes) -> bytes:
+    """Frames one binary COPY field as a length-prefixed value."""
+    return struct.pack("!i", len(data)) + data
+
+def _vector_binary(vector: Sequence[float]) -> bytes:
+    """Encodes a vector in pgvector's binary format: int16 dim, int16 unused, big-endian float4s."""
+    values = np.asarray(vector, dtype=">f4")
+    return struct.pack("!hh", len(values), 0) + values.tobytes()
+
+def copy_embeddings(
+    conn_str: str,
+    collection_id: str,
+    ids: Sequence[str],
+    texts: Sequence[str],
+    embeddings: Sequence[Sequence[float]],
+    metadatas: Sequence[dict]
+) -> int:
+    """Bulk-loads embedding rows with COPY ... FROM STDIN (binary format).
+
+    Vectors are sent as packed float4 values in pgvector's binary format, so no
+    float is formatted to or parsed from decimal text on either side.
+
+    Intended for freshly reset collections: COPY cannot skip conflicting IDs,
+    so duplicate IDs in the input are dropped (first one wins) and a
+    psycopg2.IntegrityError is raised if an ID already exists in the table.
+
+    Vector indexes are left alone here; wrap a whole build in
+    ann_indexes_suspended() to rebuild them once instead of per load.
+
+    Returns:
+        Number of rows loaded
+    """
+    buf = io.BytesIO()
+    buf.write(_COPY_BINARY_HEADER)
+    collection_field = _copy_field(uuid.UUID(str(collection_id)).bytes)
+    seen = set()
+    for chunk_id, text, vector, metadata in zip(ids, texts, embeddings, metadatas):
+        if chunk_id in seen:
+            continue
+        seen.add(chunk_id)
+        buf.write(_COPY_ROW_FIELDS)
+        buf.write(_copy_field(chunk_id.encode("utf-8")))
+        buf.write(collection_field)
+        buf.write(_copy_field(_vector_binary(vector)))
+        buf.write(_copy_field(text.encode("utf-8")))
+        buf.write(_copy_field(b"\x01" + orjson.dumps(metadata)))  # jsonb binary format version 1
+    buf.write(_COPY_BINARY_TRAILER)
+    buf.seek(0)
+
+    with _pooled_connection(conn_str) as conn:
+        with conn.cursor() as cur:
+            cur.copy_expert(
+                "COPY langchain_pg_embedding (id, collection_id, embedding, document, cmetadata) "
+                "FROM STDIN WITH (FORMAT binary)",
+                buf
+            )
+    _invalidate_stats()
+    return len(seen)
+
+@contextmanager
+def ann_indexes_suspended(conn_str: str, collection_names: Sequence[str]) -> Iterator[None]:
+    """Drops the table's HNSW/IVFFlat indexes for a bulk build and recreates them once at the end.
+
+    Only done when every stored row belongs to one of collection_names (the
+    collections being rebuilt): otherwise other collections are being served
+    from those indexes, so they are left in place and maintained row by row.
+    """
+    ann_indexes: List[Tuple[str, str]] = []
+    try:
+        with _pooled_connection(conn_str) as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT EXISTS (
+                        SELECT 1 FROM langchain_pg_embedding e
+                        JOIN langchain_pg_collection c ON c.uuid = e.collection_id
+                        WHERE c.name <> ALL(%s)
+                    )
+                """, (list(collection_names),))
+                if cur.fetchone()[0]:
+                    log("Other collections have vectors; keeping vector indexes during the load.")
+                else:
+                    cur.execute("""
+                        SELECT indexname, indexdef FROM pg_indexes
+                        WHERE tablename = 'langchain_pg_embedding'
+                          AND (indexdef ILIKE '%%USING hnsw%%' OR indexdef ILIKE '%%USING ivfflat%%')
+                    """)
+                    ann_indexes = cur.fetchall()
+                    for index_name, _ in ann_indexes:
+                        cur.execute(f'DROP INDEX IF EXISTS "{index_name}";')
+    except psycopg2.Error as e:
+        # e.g. the tables don't exist yet on a first build
+        log(f"Could not suspend vector indexes, loading with them in place: {e}")
+        ann_indexes = []
+
+    try:
+        yield
+    finally:
+        if ann_indexes:
+            with _pooled_connection(conn_str) as conn:
+                with conn.cursor() as cur:
+                    for index_name, index_def in ann_indexes:
+                        log(f"Rebuilding vector index '{index_name}' after bulk load...")
+                        cur.execute(index_def)
+
+def delete_all_collections(conn_str: str):
+    """Deletes all langchain_pg collections (and their embeddings) from the database."""
     collection_names = get_collection_names(conn_str)
     if not collection_names:
         log("No collections found to delete.")
         return
 
     log(f"Found collections to delete: {collection_names}")
-    
-    # A dummy embedder is needed to instantiate PGVector for the drop method.
-    dummy_embedder = FakeEmbeddings(size=1)
 
-    for name in collection_names:
-        try:
-            store = PGVector(
-                connection=conn_str,
-                collection_name=name,
-                embeddings=dummy_embedder,
-            )
-            store.delete_collection()
-            log(f"Successfully deleted collection '{name}'.")
-        except Exception as e:
-            log(f"Error deleting collection '{name}': {e}")
-    
-    log("Finished deleting all collections.")
+    try:
+        with _pooled_connection(conn_str) as conn:
+            with conn.cursor() as cur:
+                cur.execute("TRUNCATE langchain_pg_embedding, langchain_pg_collection RESTART IDENTITY;")
+        _invalidate_stats()
+        log("Finished deleting all collections.")
+    except psycopg2.Error as e:
+        log(f"Database error while deleting all collections: {e}")
@@ -5,8 +5,35 @@ Extracts text content from various document formats including PDF, RTF, and DOCX
 """
 
 import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
 from pathlib import Path
-from typing import List, Tuple
+from typing import Callable, Dict, List, Tuple
+
+# Optional format backends, imported once; a missing one only fails when used.
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+# Plain-text extraction without ligature/whitespace preservation: clean_text
+# normalizes whitespace anyway, and expanded ligatures ("fi") search better.
+# Mediabox clipping and CID fallback stay as in PyMuPDF's default text flags.
+_PDF_TEXT_FLAGS = (fitz.TEXT_MEDIABOX_CLIP | fitz.TEXT_CID_FOR_UNKNOWN_UNICODE) if fitz else 0
+
+try:
+    from striprtf.striprtf import rtf_to_text
+except ImportError:
+    rtf_to_text = None
+
+try:
+    from docx import Document
+except ImportError:
+    Document = None
+
+# PDFs shorter than this are extracted serially; pool startup isn't worth it.
+PDF_PARALLEL_MIN_PAGES = 20
+PDF_MAX_WORKERS = 6
 
 def extract_pages_any(file_path: Path) -> List[Tuple[int, str]]:
     """
@@ -18,58 +45,71 @@ def extract_pages_any(file_path: Path) -> List[Tuple[int, str]]:
     file_path = Path(file_path)
     extension = file_path.suffix.lower()
 
-    if extension == '.pdf':
-        return extract_pdf_pages(file_path)
-    elif extension == '.rtf':
-        return extract_rtf_pages(file_path)
-    elif extension in ['.docx', '.doc']:
-        return extract_docx_pages(file_path)
-    elif extension in ['.txt', '.md']:
-        return extract_text_pages(file_path)
-    else:
+    handler = _HANDLERS.get(extension)
+    if handler is None:
         raise ValueError(f"Unsupported file format: {extension}")
+    return handler(file_path)
+
+def _extract_page_range(file_path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """Extract pages [start, end) of a PDF. Opens its own document since fitz objects don't pickle."""
+    with fitz.open(file_path) as doc:
+        return [
+            (page.number + 1, page.get_text("text", flags=_PDF_TEXT_FLAGS))
+            for page in doc.pages(start, end)
+        ]
 
 def extract_pdf_pages(file_path: Path) -> List[Tuple[int, str]]:
-    """Extract text from PDF files."""
-    try:
-        import fitz  # PyMuPDF
-        doc = fitz.open(file_path)
-        pages = []
-        for page_num in range(len(doc)):
-            page = doc.load_page(page_num)
-            text = page.get_text()
-            pages.append((page_num + 1, text))
-        doc.close()
-        return pages
-    except ImportError:
+    """Extract text from PDF files, fanning large documents out to a process pool."""
+    if fitz is None:
         raise ImportError("PyMuPDF is required for PDF processing. Install with: pip install PyMuPDF")
 
+    with fitz.open(str(file_path)) as doc:
+        page_count = len(doc)
+
+    n_workers = min(os.cpu_count() or 1, PDF_MAX_WORKERS)
+    if page_count < PDF_PARALLEL_MIN_PAGES or n_workers < 2:
+        return _extract_page_range(str(file_path), 0, page_count)
+
+    step = -(-page_count // n_workers)
+    ranges = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+    with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+        futures = [executor.submit(_extract_page_range, str(file_path), start, end) for start, end in ranges]
+        pages = list(chain.from_iterable(future.result() for future in futures))
+    pages.sort(key=lambda page: page[0])
+    return pages
+
 def extract_rtf_pages(file_path: Path) -> List[Tuple[int, str]]:
     """Extract text from RTF files."""
-    try:
-        from striprtf.striprtf import rtf_to_text
-        with open(file_path, 'r', encoding='utf-8') as f:
-            rtf_content = f.read()
-        text = rtf_to_text(rtf_content)
-        return [(1, text)]  # RTF is typically single page
-    except ImportError:
+    if rtf_to_text is None:
         raise ImportError("striprtf is required for RTF processing. Install with: pip install striprtf")
+    with open(file_path, 'r', encoding='utf-8') as f:
+        rtf_content = f.read()
+    text = rtf_to_text(rtf_content)
+    return [(1, text)]  # RTF is typically single page
 
 def extract_docx_pages(file_path: Path) -> List[Tuple[int, str]]:
     """Extract text from DOCX files."""
-    try:
-        from docx import Document
-        doc = Document(file_path)
-        text_parts = []
-        for paragraph in doc.paragraphs:
-            text_parts.append(paragraph.text)
-        full_text = '\n'.join(text_parts)
-        return [(1, full_text)]  # DOCX is typically treated as single page
-    except ImportError:
+    if Document is None:
         raise ImportError("python-docx is required for DOCX processing. Install with: pip install python-docx")
+    doc = Document(file_path)
+    text_parts = []
+    for paragraph in doc.paragraphs:
+        text_parts.append(paragraph.text)
+    full_text = '\n'.join(text_parts)
+    return [(1, full_text)]  # DOCX is typically treated as single page
 
 def extract_text_pages(file_path: Path) -> List[Tuple[int, str]]:
     """Extract text from plain text files."""
     with open(file_path, 'r', encoding='utf-8') as f:
         content = f.read()
-    return [(1, content)]
\ No newline at end of file
+    return [(1, content)]
+
+# Extension -> extractor, used by extract_pages_any
+_HANDLERS: Dict[str, Callable[[Path], List[Tuple[int, str]]]] = {
+    '.pdf': extract_pdf_pages,
+    '.rtf': extract_rtf_pages,
+    '.docx': extract_docx_pages,
+    '.doc': extract_docx_pages,
+    '.txt': extract_text_pages,
+    '.md': extract_text_pages,
+}
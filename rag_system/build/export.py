@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 import argparse
 import re
+from operator import itemgetter
 from pathlib import Path
 from typing import List, Dict
 import orjson
@@ -12,60 +13,56 @@ def load_json(path: Path):
 
 
 def write_text_outputs(chunks: List[Dict], out_dir: Path):
+    # Chunks share a handful of sources, so resolve each file name only once
+    src_names: Dict[str, str] = {}
+
     def sort_key(c: Dict):
-        from pathlib import Path as P
+        source = c["source"]
+        src_name = src_names.get(source)
+        if src_name is None:
+            src_name = src_names[source] = Path(source).name
         page = c.get("page", 0)
-        seq = str(c.get("chunk_seq", "0"))
-        if '-' in seq:
-            main_seq, sub_seq = seq.split('-', 1)
-            return (P(c["source"]).name, int(page), int(main_seq), int(sub_seq))
-        return (P(c["source"]).name, int(page), int(seq), 0)
+        main_seq, _, sub_seq = str(c.get("chunk_seq", "0")).partition('-')
+        return (src_name, int(page), int(main_seq), int(sub_seq or 0))
 
-    chunks_sorted = sorted(chunks, key=sort_key)
+    # Keep each chunk's key alongside it so the loop below can reuse the file name
+    chunks_sorted = sorted(((sort_key(c), c) for c in chunks), key=itemgetter(0))
     # log(f"--- DEBUG: Found {len(chunks_sorted)} chunks to process. ---")
 
-    # Markdown
-    md_lines: List[str] = []
-    last_src = None
-    for c in chunks_sorted:
-        # log(f"--- DEBUG: Processing chunk with source: {c.get('source')} ---")
-        src_name = Path(c["source"]).name
-        if src_name != last_src:
-            if last_src is not None:
-                md_lines.append("\n---")
-            md_lines.append(f"# {src_name}")
-            last_src = src_name
-
-        chunk_num = c.get('article_chunk_seq') or c.get('chunk_seq', '?')
-        md_lines.append(f"\n## p{c.get('page', '?')} #{chunk_num}")
-        md_lines.append("")
+    # Markdown and plain text are written in a single pass
+    with open(out_dir / "chunks.md", "w", encoding="utf-8") as md_f, \
+         open(out_dir / "chunks.txt", "w", encoding="utf-8") as txt_f:
+        last_src = None
+        for i, ((src_name, *_), c) in enumerate(chunks_sorted):
+            # log(f"--- DEBUG: Processing chunk with source: {c.get('source')} ---")
+            content = c["content"].strip()
 
-        content = c["content"].strip()
+            md_lines: List[str] = []
+            if src_name != last_src:
+                if last_src is not None:
+                    md_lines.append("\n---")
+                md_lines.append(f"# {src_name}")
+                last_src = src_name
 
-        if 'article' in c:
-            parts = content.split('\n\n', 1)
-            title = parts[0]
-            body = parts[1] if len(parts) > 1 else ''
-            md_lines.append(f"### {title}")
-            if body:
-                body_lines = body.strip().split('\n')
-                for line in body_lines:
-                    md_lines.append(f"- {line.strip()}")
-        else:
-            content_lines = content.strip().split('\n')
-            for line in content_lines:
-                md_lines.append(f"- {line.strip()}")
+            chunk_num = c.get('article_chunk_seq') or c.get('chunk_seq', '?')
+            md_lines.append(f"\n## p{c.get('page', '?')} #{chunk_num}")
+            md_lines.append("")
 
-    (out_dir / "chunks.md").write_text("\n".join(md_lines), encoding="utf-8")
+            if 'article' in c:
+                parts = content.split('\n\n', 1)
+                title = parts[0]
+                body = parts[1] if len(parts) > 1 else ''
+                md_lines.append(f"### {title}")
+                if body:
+                    md_lines.extend(f"- {line.strip()}" for line in body.strip().split('\n'))
+            else:
+                md_lines.extend(f"- {line.strip()}" for line in content.split('\n'))
 
-    # Plain text
-    txt_lines: List[str] = []
-    for c in chunks_sorted:
-        src_name = Path(c["source"]).name
-        txt_lines.append(f"【{src_name} p{c.get('page','?')} #{c.get('chunk_seq','?')}】")
-        txt_lines.append(c["content"].strip())
-        txt_lines.append("")
-    (out_dir / "chunks.txt").write_text("\n".join(txt_lines), encoding="utf-8")
+            if i:
+                md_f.write("\n")
+                txt_f.write("\n")
+            md_f.write("\n".join(md_lines))
+            txt_f.write(f"【{src_name} p{c.get('page','?')} #{c.get('chunk_seq','?')}】\n{content}\n")
 
 
 def main():
@@ -1,12 +1,15 @@
 #!/usr/bin/env python3
 import argparse
+import asyncio
 import os
 import sys
 import hashlib
+from contextlib import nullcontext
 from pathlib import Path
 from typing import List, Dict, Optional
 import httpx
 
+import numpy as np
 import orjson
 from dotenv import load_dotenv
 
@@ -16,20 +19,45 @@ try:
 except ImportError:
     PGVector = None
 
-from ..common import LocalApiEmbeddings, log
-from .db_utils import ensure_pgvector, wipe_collection, delete_all_collections
-from .chunking import chunk_document_law, chunk_document_general
-from .structure_detector import detect_document_structure
+from ..common import LocalApiEmbeddings, log, flush_logs
+import psycopg2
+from .db_utils import ensure_pgvector, ensure_collection_index, wipe_collection, delete_all_collections, get_collection_uuid, get_existing_ids, insert_embeddings, copy_embeddings, ann_indexes_suspended
+from .chunking import chunk_document_law, chunk_document_general, iter_chunk_corpus
+from .structure_detector import detect_document_structure, classify_batch_with_llm, read_preview
 
 # --- Utility Functions ---
 
 def dumps(obj) -> bytes:
-    """Serializes an object to a formatted JSON byte string."""
-    return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS)
-
-def sha1(s: str) -> str:
-    """Computes the SHA1 hash of a string."""
-    return hashlib.sha1(s.encode("utf-8")).hexdigest()
+    """Serializes an object to a compact JSON byte string."""
+    return orjson.dumps(obj)
+
+def write_json_array(path: Path, items: List[Dict]):
+    """Streams a list of objects to disk as a JSON array, one element at a time."""
+    with open(path, "wb") as f:
+        f.write(b"[")
+        for i, item in enumerate(items):
+            if i:
+                f.write(b",")
+            f.write(orjson.dumps(item))
+        f.write(b"]")
+
+def chunk_ids(chunks: List[Dict], metadatas: List[Dict]) -> List[str]:
+    """Computes sha1(f"{source}|{article}|{content}") for each chunk.
+
+    The "{source}|" prefix is hashed once per source and the hash state is
+    copied for each chunk, so the source path isn't re-encoded every time.
+    """
+    prefixes: Dict[str, "hashlib._Hash"] = {}
+    ids = []
+    for c, m in zip(chunks, metadatas):
+        source = f"{m.get('source')}"
+        prefix = prefixes.get(source)
+        if prefix is None:
+            prefix = prefixes[source] = hashlib.sha1(f"{source}|".encode("utf-8"))
+        h = prefix.copy()
+        h.update(f"{m.get('article')}|{c['content']}".encode("utf-8"))
+        ids.append(h.hexdigest())
+    return ids
 
 def write_text_outputs(chunks: List[Dict], out_dir: Path, collection_name: str):
     """Writes the chunked text to a simple .txt file for inspection."""
@@ -67,16 +95,52 @@ class Indexer:
         if config.use_llm_detection:
             self._init_llm_client()
 
-    def run(self, doc_path: Path):
-        """Runs the full indexing pipeline for a single document path."""
+    def run(self, doc_path: Path, prelabel: Optional[str] = None):
+        """Runs the full indexing pipeline for a single document path.
+
+        Args:
+            doc_path: Markdown file to index
+            prelabel: Structure ("law"/"general") already determined, e.g. by prelabel_documents
+        """
+        strategy = self._select_strategy(doc_path, prelabel)
+        chunks = self._chunk_document(doc_path, strategy)
+        with self._bulk_load_window([doc_path]):
+            self._store_document(doc_path, chunks)
+
+    def run_all(self, doc_paths: List[Path], prelabels: Optional[Dict[Path, str]] = None):
+        """Indexes many documents, chunking upcoming files in a process pool while the current one is embedded."""
+        prelabels = prelabels or {}
+        strategies = [self._select_strategy(p, prelabels.get(p)) for p in doc_paths]
+        chunk_lists = iter_chunk_corpus(
+            doc_paths, self.config.max_chars, self.config.overlap, strategies, self.config.workers
+        )
+        with self._bulk_load_window(doc_paths):
+            for doc_path, chunks in zip(doc_paths, chunk_lists):
+                log(f"  - {doc_path.name} -> {len(chunks)} chunks.")
+                self._store_document(doc_path, chunks)
+
+    def _bulk_load_window(self, doc_paths: List[Path]):
+        """Suspends vector indexes around a --reset_collection build so they are rebuilt once, not per document."""
+        if not (self.config.embed and self.config.reset_collection):
+            return nullcontext()
+        collection_names = sorted({self.config.collection or p.stem for p in doc_paths})
+        return ann_indexes_suspended(self.config.conn, collection_names)
+
+    def _select_strategy(self, doc_path: Path, prelabel: Optional[str]) -> str:
+        """Uses the pre-computed label if there is one, otherwise runs structure detection."""
+        if prelabel:
+            log(f"→ Selected strategy for {doc_path.name}: '{prelabel}' (LLM batch)")
+            return prelabel
+        return self._determine_split_strategy(doc_path)
+
+    def _store_document(self, doc_path: Path, chunks: List[Dict]):
+        """Resets the collection if requested, then exports and embeds a document's chunks."""
         collection_name = self.config.collection or doc_path.stem
         log(f"Processing {doc_path.name} -> collection '{collection_name}'")
 
         if self.config.reset_collection:
             wipe_collection(self.config.conn, collection_name)
 
-        strategy = self._determine_split_strategy(doc_path)
-        chunks = self._chunk_document(doc_path, strategy)
         if not chunks:
             log(f"No chunks generated for {doc_path.name}. Skipping.")
             return
@@ -116,6 +180,13 @@ class Indexer:
         except Exception as e:
             log(f"⚠ LLM initialization failed: {e}")
 
+    def prelabel_documents(self, doc_paths: List[Path]) -> Dict[Path, str]:
+        """Classifies many documents with batched LLM calls; unlabeled ones are omitted."""
+        if self.llm_client is None or not doc_paths:
+            return {}
+        labels = classify_batch_with_llm([read_preview(p) for p in doc_paths], self.llm_client)
+        return {p: label for p, label in zip(doc_paths, labels) if label is not None}
+
     def _determine_split_strategy(self, doc_path: Path) -> str:
         """
         Intelligent structure detection using multiple layers:
@@ -144,7 +215,7 @@ class Indexer:
     def _export_artifacts(self, chunks: List[Dict], collection_name: str):
         """Exports chunks to JSON and TXT files."""
         self.out_dir.mkdir(parents=True, exist_ok=True)
-        (self.out_dir / f"{collection_name}_chunks.json").write_bytes(dumps(chunks))
+        write_json_array(self.out_dir / f"{collection_name}_chunks.json", chunks)
         write_text_outputs(chunks, self.out_dir, collection_name)
         log(f"Exported {len(chunks)} chunks to {self.out_dir}")
 
@@ -155,21 +226,79 @@ class Indexer:
         
         log(f"Embedding chunks for {collection_name}...")
         try:
-            vs = PGVector(embeddings=self.embedder, collection_name=collection_name, connection=self.config.conn)
-            
+            # Instantiating PGVector creates the tables and the collection row if needed
+            PGVector(embeddings=self.embedder, collection_name=collection_name, connection=self.config.conn)
+            ensure_collection_index(self.config.conn)
+            collection_id = get_collection_uuid(self.config.conn, collection_name)
+            if collection_id is None:
+                raise ValueError(f"Collection '{collection_name}' could not be created")
+
             texts = [c["content"] for c in chunks]
             metadatas = [{k: v for k, v in c.items() if k != "content"} for c in chunks]
-            ids = [sha1(f"{m.get('source')}|{m.get('article')}|{c['content']}") for c, m in zip(chunks, metadatas)]
-            
-            vs.add_texts(texts=texts, metadatas=metadatas, ids=ids)
-
-            meta = {"collection": collection_name, "count": len(texts), "model": self.config.model}
+            ids = chunk_ids(chunks, metadatas)
+            total = len(texts)
+            # Recorded after hashing (it isn't part of the ID) so a model change re-embeds in place
+            for metadata in metadatas:
+                metadata["embedding_model"] = self.config.model
+
+            # Skip chunks this collection already has from the same model so reruns don't pay for them again
+            existing = get_existing_ids(self.config.conn, collection_id, ids, self.config.model)
+            if existing:
+                keep = [i for i, chunk_id in enumerate(ids) if chunk_id not in existing]
+                ids = [ids[i] for i in keep]
+                texts = [texts[i] for i in keep]
+                metadatas = [metadatas[i] for i in keep]
+                log(f"  - Skipping {total - len(texts)} already-embedded chunks.")
+
+            if self.config.reset_collection:
+                self._bulk_load(collection_id, ids, texts, metadatas)
+            else:
+                self._batched_insert(collection_id, ids, texts, metadatas)
+
+            meta = {"collection": collection_name, "count": total, "model": self.config.model}
             (self.out_dir / f"{collection_name}_meta.json").write_bytes(dumps(meta))
-            log(f"✓ Collection '{collection_name}' created with {len(texts)} vectors.")
+            log(f"✓ Collection '{collection_name}' holds {total} vectors ({len(texts)} newly embedded).")
         except Exception as e:
             log(f"ERROR: Embedding failed for {collection_name}: {e}")
             log("Please check your embedding API server and .env configuration.")
 
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        """Embeds texts with concurrent API requests, as a float32 array."""
+        return asyncio.run(self.embedder.aembed_documents_np(texts, concurrency=self.config.embed_concurrency))
+
+    def _batched_insert(self, collection_id: str, ids: List[str], texts: List[str], metadatas: List[Dict]):
+        """Embeds and inserts batch by batch with multi-row INSERTs (upsert-safe)."""
+        batch_size = self.config.batch_size
+        for start in range(0, len(texts), batch_size):
+            end = start + batch_size
+            embeddings = self._embed(texts[start:end])
+            insert_embeddings(
+                self.config.conn, collection_id,
+                ids[start:end], texts[start:end], embeddings, metadatas[start:end],
+                page_size=batch_size
+            )
+            log(f"  - Stored {min(end, len(texts))}/{len(texts)} vectors.")
+
+    def _bulk_load(self, collection_id: str, ids: List[str], texts: List[str], metadatas: List[Dict]):
+        """Embeds everything, then loads it with a single COPY into the freshly reset collection."""
+        if not texts:
+            return
+        embeddings = []
+        batch_size = self.config.batch_size
+        for start in range(0, len(texts), batch_size):
+            embeddings.extend(self._embed(texts[start:start + batch_size]))
+        try:
+            count = copy_embeddings(self.config.conn, collection_id, ids, texts, embeddings, metadatas)
+            log(f"  - Bulk-loaded {count} vectors with COPY.")
+        except psycopg2.IntegrityError:
+            # Some IDs already exist (e.g. the same file indexed in another
+            # collection); the upsert moves those rows into this collection
+            log("  - COPY hit existing IDs, falling back to batched upserts.")
+            insert_embeddings(
+                self.config.conn, collection_id, ids, texts, embeddings, metadatas,
+                page_size=batch_size
+            )
+
 # --- Main Execution ---
 
 def get_argument_parser() -> argparse.ArgumentParser:
@@ -187,12 +316,15 @@ def get_argument_parser() -> argparse.ArgumentParser:
     # Chunking
     parser.add_argument("--max_chars", type=int, default=800)
     parser.add_argument("--overlap", type=int, default=120)
+    parser.add_argument("--workers", type=int, default=None, help="Chunking worker processes (default: CPU count, 1 = serial).")
     # Embedding
     parser.add_argument("--embed", action="store_true", help="Run the embedding process and save to database.")
     parser.add_argument("--model", default=os.environ.get("EMBED_MODEL_NAME", "nvidia/nv-embed-v2"), help="Embedding model name.")
     parser.add_argument("--embed_api_base", default=os.environ.get("EMBED_API_BASE"), help="Embedding API base URL.")
     parser.add_argument("--embed_api_key", default=os.environ.get("EMBED_API_KEY"), help="Embedding API key.")
     parser.add_argument("--no-verify-ssl", action="store_true", help="Disable SSL certificate verification.")
+    parser.add_argument("--batch_size", type=int, default=500, help="Number of chunks embedded and inserted per database batch.")
+    parser.add_argument("--embed_concurrency", type=int, default=8, help="Maximum concurrent embedding API requests.")
 
     # Structure detection
     parser.add_argument("--use-llm-detection", action="store_true", help="Use LLM to detect document structure (more accurate).")
@@ -229,9 +361,10 @@ def run_pipeline(args: argparse.Namespace):
 
     try:
         indexer = Indexer(args)
-        for doc_path in md_files:
-            indexer.run(doc_path)
+        prelabels = indexer.prelabel_documents(md_files) if args.use_llm_detection else {}
+        indexer.run_all(md_files, prelabels)
     except (ValueError, ImportError) as e:
+        flush_logs()
         raise SystemExit(f"Error: {e}")
 
     log("All tasks complete.")
@@ -1,9 +1,14 @@
 
 import argparse
 import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
 import logging
+from logging.handlers import QueueHandler, QueueListener
 
+from . import document_parser
 from .document_parser import extract_pages_any
 from .chunking import clean_text
 
@@ -33,10 +38,19 @@ def preprocess_document(input_path: Path, output_dir: Path):
     except Exception as e:
         logging.error(f"Failed to process {input_path.name}: {e}", exc_info=True)
 
+def _init_worker(log_queue):
+    """Routes worker log records to the parent's listener and disables nested PDF pools."""
+    root = logging.getLogger()
+    root.handlers[:] = [QueueHandler(log_queue)]
+    root.setLevel(logging.INFO)
+    # Files are already processed in parallel; don't fan out pages as well.
+    document_parser.PDF_MAX_WORKERS = 1
+
 def main():
     ap = argparse.ArgumentParser(description="Preprocess various document formats into clean Markdown files.")
     ap.add_argument("--input_dir", default="./documents", help="Directory containing the source documents (PDF, RTF, etc.).")
     ap.add_argument("--output_dir", default="./processed_md", help="Directory to save the processed Markdown files.")
+    ap.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of files to process in parallel (1 = serial).")
     args = ap.parse_args()
 
     input_path = Path(args.input_dir)
@@ -50,10 +64,22 @@ def main():
 
     logging.info(f"Starting preprocessing from '{input_path}' to '{output_path}'.")
 
-    # Process each file in the input directory
-    for doc_file in sorted(input_path.glob('*')):
-        if doc_file.is_file() and not doc_file.name.startswith('.'):
+    files = [f for f in sorted(input_path.glob('*')) if f.is_file() and not f.name.startswith('.')]
+    workers = max(1, min(args.workers or 1, len(files)))
+
+    if workers == 1:
+        for doc_file in files:
             preprocess_document(doc_file, output_path)
+    else:
+        # Child processes log through a queue so lines aren't interleaved or dropped
+        log_queue = multiprocessing.Queue()
+        listener = QueueListener(log_queue, *logging.getLogger().handlers)
+        listener.start()
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(log_queue,)) as ex:
+                list(ex.map(partial(preprocess_document, output_dir=output_path), files))
+        finally:
+            listener.stop()
 
     logging.info("Preprocessing complete.")
 
@@ -7,7 +7,7 @@ Falls back to regex patterns when LLM is unavailable.
 
 import re
 from pathlib import Path
-from typing import Optional, Literal
+from typing import List, Optional, Literal
 from ..common import log
 
 # ============================================================================
@@ -38,6 +38,12 @@ _RE_SUBITEM = re.compile(
     re.MULTILINE
 )
 
+# Only the first this-many characters are scanned for structural markers
+_REGEX_PREVIEW_CHARS = 3000
+
+# Only this much of a document is read: enough for the regex (3000) and LLM (1000) previews
+_HEADER_CHARS = 8192
+
 # Legal/administrative keywords in title
 _RE_LEGAL_KEYWORDS = re.compile(
     r"(法|條例|規則|辦法|要點|準則|綱要|標準|注意事項|作業|施行細則|規程|通則|律)",
@@ -71,6 +77,29 @@ CLASSIFICATION_PROMPT = """你是文件結構分析專家。請判斷以下中
 - 若為一般文件，回答：否
 """
 
+BATCH_CLASSIFICATION_PROMPT = """你是文件結構分析專家。請逐一判斷以下每份中文文件是否為法規/公文類型。
+
+法規/公文的特徵：
+- 包含「第X條」「第X章」等條款結構
+- 使用「一、二、三、」或「（一）（二）」等項目編號
+- 標題包含：法、條例、規則、辦法、要點、注意事項等關鍵字
+- 正式、條列式的行政語言
+
+一般文件的特徵：
+- 敘述性段落為主
+- 無明顯條款編號
+- 學術論文、新聞報導、散文等
+
+{documents}
+
+請依文件順序，每份文件回答一行，共 {count} 行，每行只寫一個字：
+- 若為法規/公文類型，回答：是
+- 若為一般文件，回答：否
+"""
+
+# Documents classified per LLM call by classify_batch_with_llm
+LLM_BATCH_SIZE = 10
+
 def classify_with_llm(content_preview: str, llm_client) -> Optional[Literal["law", "general"]]:
     """
     Use LLM to classify document structure.
@@ -98,6 +127,51 @@ def classify_with_llm(content_preview: str, llm_client) -> Optional[Literal["law
         log(f"⚠ LLM classification failed: {e}")
         return None
 
+def classify_batch_with_llm(previews: List[str], llm_client) -> List[Optional[Literal["law", "general"]]]:
+    """
+    Classify several documents per LLM call.
+
+    Args:
+        previews: Document contents (only the first 1000 chars of each are sent)
+        llm_client: LangChain LLM instance (e.g. ChatOpenAI)
+
+    Returns:
+        One label per preview, in order; None where a batch failed or its
+        answer could not be matched to the documents
+    """
+    labels: List[Optional[Literal["law", "general"]]] = []
+    for start in range(0, len(previews), LLM_BATCH_SIZE):
+        batch = previews[start:start + LLM_BATCH_SIZE]
+        documents = "\n\n".join(
+            f"文件 {i}（前1000字）：\n---\n{preview[:1000]}\n---" for i, preview in enumerate(batch, 1)
+        )
+        try:
+            prompt = BATCH_CLASSIFICATION_PROMPT.format(documents=documents, count=len(batch))
+            response = llm_client.invoke(prompt)
+            answers = [line.strip() for line in response.content.strip().splitlines() if line.strip()]
+        except Exception as e:
+            log(f"⚠ LLM batch classification failed: {e}")
+            answers = []
+
+        if len(answers) != len(batch):
+            log(f"⚠ LLM returned {len(answers)} labels for {len(batch)} documents, ignoring batch")
+            labels.extend([None] * len(batch))
+            continue
+
+        for answer in answers:
+            labels.append("law" if ("是" in answer or "法規" in answer or "law" in answer.lower()) else "general")
+    log(f"✓ LLM batch-classified {sum(label is not None for label in labels)}/{len(previews)} documents")
+    return labels
+
+def read_preview(doc_path: Path) -> str:
+    """Reads the first _HEADER_CHARS characters of a document ('' if unreadable)."""
+    try:
+        with doc_path.open('r', encoding='utf-8') as f:
+            return f.read(_HEADER_CHARS)
+    except Exception as e:
+        log(f"⚠ Cannot read file {doc_path.name}: {e}")
+        return ""
+
 # ============================================================================
 # REGEX-BASED DETECTION (FALLBACK)
 # ============================================================================
@@ -109,21 +183,24 @@ def detect_structure_by_regex(content: str) -> Literal["law", "general"]:
     Returns:
         "law" if regulatory structure detected, "general" otherwise
     """
-    # Count structural markers
-    article_count = len(_RE_LAW_ARTICLE.findall(content[:3000]))
-    chapter_count = len(_RE_CHAPTER.findall(content[:3000]))
-    numbered_count = len(_RE_NUMBERED_ITEM.findall(content[:3000]))
-    subitem_count = len(_RE_SUBITEM.findall(content[:3000]))
-
-    # Decision logic: if ANY strong signal exists
-    if article_count >= 2:  # At least 2 articles
-        log(f"✓ Regex: Found {article_count} articles → law")
+    # Each pattern is scanned separately: patterns starting with a literal
+    # (第, （) let the regex engine skip ahead with a fast search, which an
+    # alternation of all four cannot do. Cheapest decisive checks go first.
+    end = _REGEX_PREVIEW_CHARS
+    articles = _RE_LAW_ARTICLE.finditer(content, 0, end)
+    if next(articles, None) and next(articles, None):  # At least 2 articles
+        log("✓ Regex: Found at least 2 articles → law")
         return "law"
 
+    chapter_count = len(_RE_CHAPTER.findall(content, 0, end))
+
     if chapter_count >= 1:  # At least 1 chapter
         log(f"✓ Regex: Found {chapter_count} chapters → law")
         return "law"
 
+    numbered_count = len(_RE_NUMBERED_ITEM.findall(content, 0, end))
+    subitem_count = len(_RE_SUBITEM.findall(content, 0, end))
+
     # Combination of numbered items + subitems (common in notices)
     if numbered_count >= 3 and subitem_count >= 2:
         log(f"✓ Regex: Found {numbered_count} items + {subitem_count} subitems → law")
@@ -177,10 +254,9 @@ def detect_document_structure(
     """
     log(f"Detecting structure for: {doc_path.name}")
 
-    try:
-        content = doc_path.read_text(encoding='utf-8')
-    except Exception as e:
-        log(f"⚠ Cannot read file: {e}, using filename only")
+    content = read_preview(doc_path)
+    if not content:
+        log("⚠ No content to inspect, using filename only")
         return detect_structure_by_filename(doc_path.name)
 
     # Layer 1: LLM classification
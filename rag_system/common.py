@@ -1,31 +1,254 @@
+import asyncio
+import atexit
+import base64
+import gzip
+import hashlib
+import importlib.util
+import logging
+import multiprocessing
+import os
+import queue
+import sqlite3
 import sys
+import threading
 import warnings
-from typing import List
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 import httpx
+import numpy as np
+import orjson
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_random_exponential
 
 # Global flag to control logging output
 _QUIET_MODE = False
 
+# Pending messages queued by log_debug() until the next flush_logs()
+_LOG_BUFFER: List[str] = []
+_LOG_BUFFER_LOCK = threading.Lock()
+
 def set_quiet_mode(quiet: bool = True):
     """Enable or disable quiet mode globally."""
     global _QUIET_MODE
     _QUIET_MODE = quiet
 
-def log(msg: str):
-    """Simple, unified logging function. Respects global quiet mode."""
+class _StderrHandler(logging.Handler):
+    """Writes records to whatever sys.stderr is at emit time."""
+    def emit(self, record: logging.LogRecord):
+        try:
+            sys.stderr.write(self.format(record) + "\n")
+            sys.stderr.flush()
+        except Exception:
+            self.handleError(record)
+
+class _BlockingQueueHandler(QueueHandler):
+    """QueueHandler that waits for room instead of raising when the queue is full."""
+    def enqueue(self, record: logging.LogRecord):
+        self.queue.put(record)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The message is already final; skip QueueHandler's copy/format step
+        return record
+
+# log() hands records to a background listener thread so callers never block on
+# stderr. Started lazily, per process; worker processes write directly instead,
+# since they can exit without running atexit and would lose queued lines.
+_LOGGER = logging.getLogger("rag_system.log")
+_LOGGER.propagate = False
+_LOGGER.setLevel(logging.INFO)
+_LOG_QUEUE: Optional[queue.Queue] = None
+_LOG_LISTENER: Optional[QueueListener] = None
+_LOG_LISTENER_PID: Optional[int] = None
+_LOG_LISTENER_LOCK = threading.Lock()
+
+def _stop_log_listener():
+    global _LOG_LISTENER
+    if _LOG_LISTENER is not None and _LOG_LISTENER_PID == os.getpid():
+        _LOG_LISTENER.stop()
+    _LOG_LISTENER = None
+
+def _ensure_log_listener() -> bool:
+    """Starts the queue listener in this process if needed. Returns False in worker processes."""
+    global _LOG_QUEUE, _LOG_LISTENER, _LOG_LISTENER_PID
+    if _LOG_LISTENER is not None and _LOG_LISTENER_PID == os.getpid():
+        return True
+    if multiprocessing.parent_process() is not None:
+        return False
+    with _LOG_LISTENER_LOCK:
+        if _LOG_LISTENER is None or _LOG_LISTENER_PID != os.getpid():
+            _LOG_QUEUE = queue.Queue(maxsize=10000)
+            handler = _StderrHandler()
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            _LOGGER.handlers[:] = [_BlockingQueueHandler(_LOG_QUEUE)]
+            _LOG_LISTENER = QueueListener(_LOG_QUEUE, handler)
+            _LOG_LISTENER.start()
+            _LOG_LISTENER_PID = os.getpid()
+            atexit.register(_stop_log_listener)
+    return True
+
+def _emit(text: str):
+    """Sends one already-formatted block of log text to stderr via the listener."""
+    if _ensure_log_listener():
+        _LOGGER.info(text)
+    else:
+        sys.stderr.write(text + "\n")
+        sys.stderr.flush()
+
+def log(msg: str, *args: Any):
+    """Simple, unified logging function. Respects global quiet mode.
+
+    Like stdlib logging, msg is %-formatted with args only when the message is
+    actually emitted, so pass expensive values (e.g. models) as args.
+    """
     if not _QUIET_MODE:
-        print(f"[LOG] {msg}", file=sys.stderr, flush=True)
+        _emit(f"[LOG] {msg % args if args else msg}")
+
+def log_error(msg: str):
+    """Logs an error. Errors are shown even in quiet mode."""
+    _emit(f"[ERROR] {msg}")
+
+def log_debug(msg_fn: Callable[[], str]):
+    """Deferred logging for hot paths.
+
+    The message is built by calling msg_fn only when quiet mode is off, and is
+    queued instead of written. Call flush_logs() to emit queued messages.
+    """
+    if not _QUIET_MODE:
+        line = f"[LOG] {msg_fn()}\n"
+        with _LOG_BUFFER_LOCK:
+            _LOG_BUFFER.append(line)
+
+def flush_logs():
+    """Write all messages queued by log_debug() with a single write call.
+
+    Also waits until the background listener has written everything logged so
+    far, so output printed afterwards (e.g. a SystemExit message) stays in order.
+    """
+    with _LOG_BUFFER_LOCK:
+        pending = "".join(_LOG_BUFFER)
+        _LOG_BUFFER.clear()
+    if pending:
+        _emit(pending[:-1])
+    if _LOG_QUEUE is not None and _LOG_LISTENER_PID == os.getpid():
+        _LOG_QUEUE.join()
+
+# HTTP/2 needs the optional 'h2' package (httpx[http2]); fall back to HTTP/1.1 without it
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# httpx only decodes brotli responses when a brotli package is installed
+_BROTLI_AVAILABLE = any(importlib.util.find_spec(m) is not None for m in ("brotli", "brotlicffi"))
+
+# Request bodies above this size are gzip-compressed before sending
+GZIP_MIN_BYTES = 4096
+
+# Status a server answers a gzip body with when it does not support Content-Encoding.
+# 400/422 are not counted: they also mean e.g. an over-long input or an unknown model.
+_GZIP_REJECTED_STATUS = 415
+
+# Statuses a server may answer a base64 encoding_format with when it only returns float lists
+_BASE64_REJECTED_STATUSES = {400, 422}
+
+# Rate limiting and transient server errors are retried; other statuses fail fast.
+# Connection-level failures are already retried by the httpx transport.
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+_RETRY_ATTEMPTS = 6
+_RETRY_AFTER_MAX = 60.0
+_backoff = wait_random_exponential(multiplier=0.5, max=30)
+
+def _is_retryable(exc: BaseException) -> bool:
+    return isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code in _RETRY_STATUSES
+
+def _retry_wait(retry_state) -> float:
+    """Honors a numeric Retry-After header, else backs off exponentially with jitter."""
+    exc = retry_state.outcome.exception()
+    retry_after = exc.response.headers.get("Retry-After") if isinstance(exc, httpx.HTTPStatusError) else None
+    if retry_after:
+        try:
+            return min(float(retry_after), _RETRY_AFTER_MAX)
+        except ValueError:
+            pass
+    return _backoff(retry_state)
+
+def _log_retry(retry_state):
+    exc = retry_state.outcome.exception()
+    log(f"Batch got status {exc.response.status_code}; retrying in {retry_state.next_action.sleep:.1f}s "
+        f"(attempt {retry_state.attempt_number}/{_RETRY_ATTEMPTS})")
+
+_retry_transient = retry(
+    retry=retry_if_exception(_is_retryable),
+    wait=_retry_wait,
+    stop=stop_after_attempt(_RETRY_ATTEMPTS),
+    before_sleep=_log_retry,
+    reraise=True,
+)
+
+class EmbeddingCache:
+    """
+    Persistent SQLite cache of embedding vectors.
+
+    Keys are sha256(model_name + "\\0" + text) digests; vectors are stored as
+    float32 blobs. Safe to share between threads.
+    """
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS emb (k BLOB PRIMARY KEY, v BLOB)")
+
+    @staticmethod
+    def key(model_name: str, text: str) -> bytes:
+        return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).digest()
+
+    def get_many(self, keys: Sequence[bytes]) -> Dict[bytes, np.ndarray]:
+        """Returns the cached float32 vectors for whichever keys are present."""
+        found: Dict[bytes, np.ndarray] = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            for start in range(0, len(unique), 500):  # stay under SQLite's bound-parameter limit
+                part = unique[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT k, v FROM emb WHERE k IN ({','.join('?' * len(part))})", part
+                ).fetchall()
+                for k, v in rows:
+                    found[k] = np.frombuffer(v, dtype=np.float32)
+        return found
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def put_many(self, items: Sequence[Tuple[bytes, Sequence[float]]]):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO emb VALUES (?, ?)",
+                [(k, np.asarray(v, dtype=np.float32).tobytes()) for k, v in items]
+            )
 
 class LocalApiEmbeddings:
     """
     A wrapper for a local embedding API that mimics LangChain's Embeddings interface.
     It includes batching and retry logic.
+
+    If cache_path (or the EMBED_CACHE_PATH environment variable) is set, vectors
+    are cached on disk and only uncached texts are sent to the API.
+
+    Vectors are requested as base64 float32 by default, switching to float
+    lists for good if the server rejects base64; responses are requested compressed; with compress_requests, large request
+    bodies are gzipped too, falling back to plain JSON if the server rejects them.
     """
-    def __init__(self, api_base: str, api_key: str, model_name: str = "nvidia/nv-embed-v2", batch_size: int = 8, verify_ssl: bool = False):
+    def __init__(self, api_base: str, api_key: str, model_name: str = "nvidia/nv-embed-v2", batch_size: int = 8, verify_ssl: bool = False, concurrency: int = 8, cache_path: Optional[str] = None, compress_requests: bool = True, encoding_format: str = "base64"):
         self.api_base = api_base.rstrip('/')
         self.api_key = api_key
         self.model_name = model_name
         self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.compress_requests = compress_requests
+        self.encoding_format = encoding_format
+
+        cache_path = cache_path or os.environ.get("EMBED_CACHE_PATH")
+        self.cache = EmbeddingCache(cache_path) if cache_path else None
+        # Hot in-process reuse of query vectors, on top of the disk cache
+        self._embed_query_cached = lru_cache(maxsize=4096)(self._embed_query)
         
         if verify_ssl:
             verify_context = True
@@ -36,57 +259,278 @@ class LocalApiEmbeddings:
             )
             verify_context = False
 
-        # Configure a client with built-in retries for robustness.
-        if verify_ssl:
-            transport = httpx.HTTPTransport(retries=3)
-        else:
-            transport = httpx.HTTPTransport(retries=3, verify=False)
+        # Configure a pooled HTTP/2 client with built-in retries for robustness.
+        # Concurrent batches then multiplex over one kept-alive TLS connection.
+        transport = httpx.HTTPTransport(
+            retries=3,
+            verify=verify_context,
+            http2=_HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_keepalive_connections=32, max_connections=64, keepalive_expiry=60)
+        )
         timeout_config = httpx.Timeout(600.0, connect=30.0)
-        self.client = httpx.Client(verify=verify_context, transport=transport, timeout=timeout_config, follow_redirects=True)
+        self._headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "Accept-Encoding": "gzip, br" if _BROTLI_AVAILABLE else "gzip"
+        }
+        self.client = httpx.Client(verify=verify_context, transport=transport, timeout=timeout_config, follow_redirects=True, headers=self._headers)
+        self._verify = verify_context
+        self._timeout = timeout_config
+
+    def close(self):
+        """Closes the underlying HTTP client and the embedding cache."""
+        self.client.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    def __enter__(self) -> "LocalApiEmbeddings":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def _from_cache(self, texts: List[str]) -> Tuple[List[Optional[np.ndarray]], List[int], List[bytes]]:
+        """Looks texts up in the disk cache.
+
+        Returns:
+            (vectors with None for misses, indices of misses, cache keys)
+        """
+        if self.cache is None:
+            return [None] * len(texts), list(range(len(texts))), []
+        keys = [EmbeddingCache.key(self.model_name, t) for t in texts]
+        found = self.cache.get_many(keys)
+        vectors = [found.get(k) for k in keys]
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if found:
+            log(f"Embedding cache: {len(texts) - len(missing)}/{len(texts)} hits")
+        return vectors, missing, keys
+
+    def _fill_from_api(self, vectors: List[Optional[np.ndarray]], missing: List[int], keys: List[bytes], fresh: np.ndarray) -> List[np.ndarray]:
+        """Places freshly embedded vectors into the result list and caches them."""
+        for i, vector in zip(missing, fresh):
+            vectors[i] = vector
+        if self.cache is not None and len(fresh):
+            self.cache.put_many([(keys[i], vector) for i, vector in zip(missing, fresh)])
+        return vectors
+
+    @staticmethod
+    def _dedupe(texts: List[str]) -> Tuple[List[str], List[int]]:
+        """Returns the distinct texts (first-seen order) and each input's index into them."""
+        uniq: Dict[str, int] = {}
+        order = [uniq.setdefault(t, len(uniq)) for t in texts]
+        return list(uniq), order
+
+    @staticmethod
+    def _assemble(vectors: List[np.ndarray], order: List[int]) -> np.ndarray:
+        """Stacks the distinct vectors and expands them back to the input order."""
+        if not vectors:
+            return np.empty((0, 0), dtype=np.float32)
+        matrix = np.vstack(vectors)
+        return matrix if len(order) == len(vectors) else matrix[order]
 
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        """Embeds a list of documents, handling batching automatically."""
+        """Embeds a list of documents, handling batching automatically.
+
+        Duplicate texts are embedded once. Multiple batches are sent
+        concurrently (up to self.concurrency requests) unless called from
+        inside a running event loop, where batches are sent one after another
+        on the shared sync client.
+        """
+        return self.embed_documents_np(texts).tolist()
+
+    def embed_documents_np(self, texts: List[str]) -> np.ndarray:
+        """Same as embed_documents, but returns a (len(texts), dim) float32 array."""
+        unique, order = self._dedupe(texts)
+        return self._assemble(self._embed_unique(unique), order)
+
+    def _embed_unique(self, texts: List[str]) -> List[np.ndarray]:
+        vectors, missing, keys = self._from_cache(texts)
+        if not missing:
+            return vectors
+        pending = [texts[i] for i in missing]
+
+        fresh = None
+        if len(pending) > self.batch_size:
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                fresh = asyncio.run(self._aembed_uncached(pending, self.concurrency))
+        if fresh is None:
+            fresh = self._embed_uncached(pending)
+        return self._fill_from_api(vectors, missing, keys, fresh)
+
+    def _embed_uncached(self, texts: List[str]) -> np.ndarray:
+        """Sends all texts to the API batch by batch on the sync client."""
         all_embeddings = []
         num_texts = len(texts)
         log(f"Embedding {num_texts} documents in batches of {self.batch_size}...")
         
-        for i in range(0, num_texts, self.batch_size):
-            batch = texts[i:i + self.batch_size]
-            num_batches = (num_texts + self.batch_size - 1) // self.batch_size
-            log(f"Processing batch {i//self.batch_size + 1}/{num_batches}")
+        batch_size = self.batch_size
+        num_batches = (num_texts + batch_size - 1) // batch_size
+        for batch_no, i in enumerate(range(0, num_texts, batch_size), 1):
+            batch = texts[i:i + batch_size]
+            log("Processing batch %d/%d", batch_no, num_batches)
             try:
-                batch_embeddings = self._embed_batch(batch)
-                all_embeddings.extend(batch_embeddings)
+                all_embeddings.append(self._embed_batch(batch))
             except httpx.HTTPStatusError as e:
-                print(f"[ERROR] Batch failed with status {e.response.status_code}: {e.response.text}", file=sys.stderr)
+                log_error(f"Batch failed with status {e.response.status_code}: {e.response.text}")
                 raise  # Re-raise the exception after logging
             except httpx.RequestError as e:
-                print(f"[ERROR] Batch failed due to request error: {e}", file=sys.stderr)
+                log_error(f"Batch failed due to request error: {e}")
                 raise
 
-        return all_embeddings
+        return np.concatenate(all_embeddings)
 
-    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
-        """Embeds a single batch of documents."""
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        payload = {
+    async def aembed_documents(self, texts: List[str], concurrency: Optional[int] = None) -> List[List[float]]:
+        """Embeds a list of documents with up to `concurrency` batch requests in flight.
+
+        Results are returned in input order, same as embed_documents.
+        """
+        return (await self.aembed_documents_np(texts, concurrency)).tolist()
+
+    async def aembed_documents_np(self, texts: List[str], concurrency: Optional[int] = None) -> np.ndarray:
+        """Same as aembed_documents, but returns a (len(texts), dim) float32 array."""
+        unique, order = self._dedupe(texts)
+        vectors, missing, keys = self._from_cache(unique)
+        if missing:
+            fresh = await self._aembed_uncached([unique[i] for i in missing], concurrency or self.concurrency)
+            vectors = self._fill_from_api(vectors, missing, keys, fresh)
+        return self._assemble(vectors, order)
+
+    async def _aembed_uncached(self, texts: List[str], concurrency: int) -> np.ndarray:
+        """Sends all texts to the API with up to `concurrency` concurrent batch requests."""
+        num_texts = len(texts)
+        log(f"Embedding {num_texts} documents in batches of {self.batch_size} ({concurrency} concurrent)...")
+        semaphore = asyncio.Semaphore(concurrency)
+        batches = [texts[i:i + self.batch_size] for i in range(0, num_texts, self.batch_size)]
+
+        # The async client is bound to the running event loop, so one is opened per call
+        async with self._async_client(concurrency) as client:
+            async def embed_one(batch: List[str]) -> np.ndarray:
+                async with semaphore:
+                    return await self._embed_batch_async(client, batch)
+
+            results = await asyncio.gather(*(embed_one(batch) for batch in batches))
+
+        log(f"Successfully received {num_texts} vectors.")
+        return np.concatenate(results)
+
+    def _async_client(self, concurrency: int) -> httpx.AsyncClient:
+        transport = httpx.AsyncHTTPTransport(
+            retries=3,
+            verify=self._verify,
+            http2=_HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        )
+        return httpx.AsyncClient(verify=self._verify, transport=transport, timeout=self._timeout, follow_redirects=True, headers=self._headers)
+
+    async def _embed_batch_async(self, client: httpx.AsyncClient, texts: List[str]) -> np.ndarray:
+        """Embeds a single batch of documents on an async client."""
+        try:
+            response = await self._post_batch_async(client, texts)
+        except httpx.HTTPStatusError as e:
+            log_error(f"Batch failed with status {e.response.status_code}: {e.response.text}")
+            raise
+        except httpx.RequestError as e:
+            log_error(f"Batch failed due to request error: {e}")
+            raise
+        return self._parse_embeddings(orjson.loads(response.content))
+
+    @_retry_transient
+    async def _post_batch_async(self, client: httpx.AsyncClient, texts: List[str]) -> httpx.Response:
+        body, headers = self._request_body(texts)
+        response = await client.post(f"{self.api_base}/embeddings", content=body, headers=headers)
+        if headers and self._gzip_rejected(response):
+            response = await client.post(f"{self.api_base}/embeddings", content=orjson.dumps(self._payload(texts)))
+        if self._base64_rejected(response):
+            plain = await client.post(f"{self.api_base}/embeddings", content=orjson.dumps(self._payload(texts, "float")))
+            if self._accept_float_format(plain):
+                response = plain
+        response.raise_for_status()
+        return response
+
+    @staticmethod
+    def _parse_embeddings(data: dict) -> np.ndarray:
+        """Converts an /embeddings response body to a (n, dim) float32 array.
+
+        Accepts both base64 (little-endian float32) and plain float list vectors,
+        since some servers ignore encoding_format.
+        """
+        items = data["data"]
+        if not items or not isinstance(items[0]["embedding"], str):
+            return np.asarray([item["embedding"] for item in items], dtype=np.float32)
+        first = np.frombuffer(base64.b64decode(items[0]["embedding"]), dtype="<f4")
+        out = np.empty((len(items), first.size), dtype=np.float32)
+        out[0] = first
+        for i in range(1, len(items)):
+            out[i] = np.frombuffer(base64.b64decode(items[i]["embedding"]), dtype="<f4")
+        return out
+
+    def _payload(self, texts: List[str], encoding_format: Optional[str] = None) -> dict:
+        return {
             "model": self.model_name,
             "input": texts,
-            "encoding_format": "float"
+            "encoding_format": encoding_format or self.encoding_format
         }
-        
-        log(f"Sending {len(texts)} texts to {self.api_base}/embeddings")
-        response = self.client.post(f"{self.api_base}/embeddings", headers=headers, json=payload)
+
+    def _request_body(self, texts: List[str]) -> Tuple[bytes, Dict[str, str]]:
+        """Serializes a batch request, gzipping it when large enough.
+
+        Returns:
+            (body, extra headers)
+        """
+        body = orjson.dumps(self._payload(texts))
+        if self.compress_requests and len(body) > GZIP_MIN_BYTES:
+            return gzip.compress(body, compresslevel=5), {"Content-Encoding": "gzip"}
+        return body, {}
+
+    def _gzip_rejected(self, response: httpx.Response) -> bool:
+        """Turns request compression off if the server refused a gzip body."""
+        if response.status_code != _GZIP_REJECTED_STATUS:
+            return False
+        log(f"Server answered {response.status_code} to a gzip request body; sending uncompressed JSON from now on")
+        self.compress_requests = False
+        return True
+
+    def _base64_rejected(self, response: httpx.Response) -> bool:
+        """True if a base64 request failed in a way that float lists might fix."""
+        return self.encoding_format == "base64" and response.status_code in _BASE64_REJECTED_STATUSES
+
+    def _accept_float_format(self, response: httpx.Response) -> bool:
+        """Switches to float lists for good if the float resend of a rejected base64 request succeeded."""
+        if not response.is_success:
+            return False
+        log("Server rejected encoding_format=base64; requesting float lists from now on")
+        self.encoding_format = "float"
+        return True
+
+    @_retry_transient
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        """Embeds a single batch of documents, retrying 429/5xx responses."""
+        log("Sending %d texts to %s/embeddings", len(texts), self.api_base)
+        body, headers = self._request_body(texts)
+        response = self.client.post(f"{self.api_base}/embeddings", content=body, headers=headers)
+        if headers and self._gzip_rejected(response):
+            response = self.client.post(f"{self.api_base}/embeddings", content=orjson.dumps(self._payload(texts)))
+        if self._base64_rejected(response):
+            plain = self.client.post(f"{self.api_base}/embeddings", content=orjson.dumps(self._payload(texts, "float")))
+            if self._accept_float_format(plain):
+                response = plain
         response.raise_for_status()  # Will raise an exception for 4xx/5xx responses
         
-        data = response.json()
-        embeddings = [item["embedding"] for item in data["data"]]
-        log(f"Successfully received {len(embeddings)} vectors.")
+        embeddings = self._parse_embeddings(orjson.loads(response.content))
+        log("Successfully received %d vectors.", len(embeddings))
         return embeddings
 
     def embed_query(self, text: str) -> List[float]:
         """Embeds a single query."""
-        return self.embed_documents([text])[0]
+        return list(self._embed_query_cached(text))
+
+    def _embed_query(self, text: str) -> Tuple[float, ...]:
+        return tuple(self.embed_documents_np([text])[0].tolist())
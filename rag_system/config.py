@@ -5,8 +5,9 @@ Centralized configuration management for the RAG system.
 All hardcoded values should be defined here as constants or configurable parameters.
 """
 
-from typing import Optional
+from typing import Dict, Optional
 from dataclasses import dataclass
+from functools import lru_cache
 import os
 
 
@@ -51,13 +52,30 @@ DEFAULT_COLLECTION = "laws"
 # RAG CONFIGURATION DATACLASS
 # ============================================================================
 
-@dataclass
+@lru_cache(maxsize=1)
+def _env_defaults() -> Dict[str, Optional[str]]:
+    """
+    Environment-backed defaults, read once on first use.
+
+    Deferred until a config is first built so load_dotenv() in the entry points
+    still takes effect; call _env_defaults.cache_clear() after changing os.environ.
+    """
+    return {
+        "conn_string": os.environ.get("PGVECTOR_URL"),
+        "embed_api_base": os.environ.get("EMBED_API_BASE"),
+        "llm_api_base": os.environ.get("LLM_API_BASE"),
+        "embed_api_key": os.environ.get("EMBED_API_KEY"),
+    }
+
+@dataclass(frozen=True, slots=True)
 class RAGConfig:
     """
     Configuration container for RAG system.
 
     This class holds all configurable parameters for the RAG system,
     making it easy to pass configuration around and override defaults.
+    Instances are immutable and hashable; use dataclasses.replace() to derive
+    a modified copy.
     """
     # Retrieval settings
     top_k: int = DEFAULT_TOP_K
@@ -71,6 +89,7 @@ class RAGConfig:
     embed_model: str = DEFAULT_EMBED_MODEL
     chat_model: str = DEFAULT_CHAT_MODEL
     temperature: float = DEFAULT_TEMPERATURE
+    service_tier: Optional[str] = None  # OpenAI service tier (e.g. "priority"); None = provider default
 
     # API settings
     embed_api_base: Optional[str] = None
@@ -95,19 +114,23 @@ class RAGConfig:
                 f"got {self.content_max_length}"
             )
 
-        # Load from environment if not provided
+        # Load from environment if not provided (frozen, so bypass __setattr__)
+        if self.conn_string and self.embed_api_base and self.llm_api_base and self.embed_api_key:
+            return
+        env = _env_defaults()
+
         if not self.conn_string:
-            self.conn_string = os.environ.get("PGVECTOR_URL")
+            object.__setattr__(self, "conn_string", env["conn_string"])
 
         if not self.embed_api_base:
-            self.embed_api_base = os.environ.get("EMBED_API_BASE")
+            object.__setattr__(self, "embed_api_base", env["embed_api_base"])
 
         if not self.llm_api_base:
             # Fallback to embed_api_base if llm_api_base is not explicitly set
-            self.llm_api_base = os.environ.get("LLM_API_BASE", self.embed_api_base)
+            object.__setattr__(self, "llm_api_base", env["llm_api_base"] or self.embed_api_base)
 
         if not self.embed_api_key:
-            self.embed_api_key = os.environ.get("EMBED_API_KEY")
+            object.__setattr__(self, "embed_api_key", env["embed_api_key"])
 
     @classmethod
     def from_env(cls) -> "RAGConfig":
@@ -122,6 +145,7 @@ class RAGConfig:
             embed_api_key=os.environ.get("EMBED_API_KEY"),
             embed_model=os.environ.get("EMBED_MODEL_NAME", DEFAULT_EMBED_MODEL),
             chat_model=os.environ.get("CHAT_MODEL_NAME", DEFAULT_CHAT_MODEL),
+            service_tier=os.environ.get("LLM_SERVICE_TIER") or None,
         )
 
     def validate(self) -> None:
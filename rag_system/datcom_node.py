@@ -1,17 +1,30 @@
 """
 Node for executing a fixed sequence of DATCOM tool calls.
 """
-import json
+import asyncio
 import math
-from typing import List, Dict, Any, Optional
-from langchain_openai import ChatOpenAI
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from functools import lru_cache
+import numpy as np
+import orjson
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Tuple
+from langchain_core.exceptions import OutputParserException
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
-from pydantic import BaseModel, Field
+from langchain_core.runnables import Runnable, RunnableLambda
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError, field_validator
 
 from .state import GraphState
 from .common import log
-from .tool import create_datcom_calculator_tools
+from .extraction_cache import ExtractionCache
+
+if TYPE_CHECKING:
+    # Annotation only; langchain_openai is slow to import and callers pass the client in
+    from langchain_openai import ChatOpenAI
 
 # --- Parameter Extraction ---
 
@@ -52,7 +65,22 @@ class DatcomParams(BaseModel):
     xw: Optional[float] = Field(None, description="Wing position (XW) in feet")
     xh: Optional[float] = Field(None, description="Horizontal tail position (XH) in feet")
 
-PARAM_EXTRACTION_PROMPT = """Extract all DATCOM parameters from the user query below. 
+    @field_validator("nose_cone_length_ratio", "tail_cone_length_ratio", mode="before")
+    @classmethod
+    def _default_cone_ratio(cls, v):
+        # Strict structured output sends every field, so an omitted ratio arrives as null
+        return 0.2 if v is None else v
+
+# Built once so every extraction reuses the compiled pydantic-core validator
+_DATCOM_PARAMS_ADAPTER = TypeAdapter(DatcomParams)
+
+# Bump whenever PARAM_EXTRACTION_SYSTEM_PROMPT or DatcomParams changes, so cached
+# extractions made with the old prompt are no longer used.
+PROMPT_VERSION = "3"
+
+# Static system prompt: kept byte-identical across calls so the provider can
+# reuse its cached prefix; only the short human message carries the query.
+PARAM_EXTRACTION_SYSTEM_PROMPT = """Extract all DATCOM parameters from the user's query.
 Return ONLY a valid JSON object with the following fields (use null for missing values):
 {{
   "wing_S": <number or null>,
@@ -79,137 +107,409 @@ Return ONLY a valid JSON object with the following fields (use null for missing
 }}
 
 IMPORTANT: 
-- For angle of attack ranges like "-2到10度步進2度", extract as a list: [-2, 0, 2, 4, 6, 8, 10]
 - Only extract values explicitly mentioned in the query
 - Use null for any parameter not mentioned
 - Return ONLY the JSON object, no explanations
 
-User Query: {query}
+**Examples:**
+- User query: "生成 DATCOM：機翼 S=530 ft², A=2.8, λ=0.3, 後掠角 45 度，Mach 0.8，高度 10000 ft，攻角 -2到10度步進2度，重量 40000 lbs"
+  JSON output: {{"wing_S": 530, "wing_A": 2.8, "wing_lambda": 0.3, "wing_sweep_angle": 45, "htail_S": null, "htail_A": null, "htail_lambda": null, "htail_sweep_angle": null, "vtail_S": null, "vtail_A": null, "vtail_lambda": null, "vtail_sweep_angle": null, "mach_numbers": [0.8], "altitudes": [10000], "alpha_degrees": [-2, 0, 2, 4, 6, 8, 10], "weight": 40000, "fuselage_length": null, "max_diameter": null, "xcg": null, "xw": null, "xh": null}}
+- User query: "Create a DATCOM file for a UAV: wing area 50, aspect ratio 6, taper 0.5, sweep 0. Mach 0.2 and 0.3 at 5000 ft. Fuselage 20 ft long, 2 ft diameter, XCG=8, XW=7.5, XH=18."
+  JSON output: {{"wing_S": 50, "wing_A": 6, "wing_lambda": 0.5, "wing_sweep_angle": 0, "htail_S": null, "htail_A": null, "htail_lambda": null, "htail_sweep_angle": null, "vtail_S": null, "vtail_A": null, "vtail_lambda": null, "vtail_sweep_angle": null, "mach_numbers": [0.2, 0.3], "altitudes": [5000], "alpha_degrees": null, "weight": null, "fuselage_length": 20, "max_diameter": 2, "xcg": 8, "xw": 7.5, "xh": 18}}
+"""
 
-JSON Output:"""
+# Angle of attack ranges such as "-2到10度步進2度" (start to end, step); these are
+# expanded here instead of asking the LLM to enumerate them
+_ALPHA_RANGE_RE = re.compile(r'(-?\d+(?:\.\d+)?)\s*度?\s*到\s*(-?\d+(?:\.\d+)?)\s*度?\s*步進\s*(-?\d+(?:\.\d+)?)')
+
+def _parse_alpha_range(query: str) -> Optional[List[float]]:
+    """Returns the angles of attack for the first start/end/step range in query, if any."""
+    m = _ALPHA_RANGE_RE.search(query)
+    if m is None:
+        return None
+    start, end, step = map(float, m.groups())
+    if step <= 0 or end < start:
+        return None
+    # Multiply instead of accumulating (and round off binary noise) so the
+    # end point isn't lost to rounding
+    count = math.floor((end - start) / step + 1e-9) + 1
+    return [round(start + i * step, 10) for i in range(count)]
+
+# Keys accepted by the key=value fast path besides the DatcomParams field names
+_FAST_PATH_ALIASES = {
+    "翼面積": "wing_S", "展弦比": "wing_A", "尖削比": "wing_lambda", "後掠角": "wing_sweep_angle",
+    "mach": "mach_numbers", "馬赫": "mach_numbers",
+    "altitude": "altitudes", "高度": "altitudes",
+    "重量": "weight",
+}
+_FAST_PATH_LIST_FIELDS = frozenset({"mach_numbers", "altitudes", "alpha_degrees"})
+_NUMBER_RE = re.compile(r'[-+]?\d*\.?\d+')
+_KEY_VALUE_RE = re.compile(r'([A-Za-z_]\w*|[\u4e00-\u9fff]+)\s*[=:：＝]\s*(\[[^\]]*\]|[-+]?\d*\.?\d+)')
+_LIST_SEPARATOR_RE = re.compile(r'[,\s]+')
+
+def _regex_extract(query: str) -> Optional[DatcomParams]:
+    """
+    Parses queries written entirely as key=value pairs (e.g. "wing_S=530,
+    wing_A=2.8, ..., mach_numbers=[0.8], altitudes=[10000]") without the LLM.
+
+    Returns None, so the caller falls back to the LLM, unless every number in
+    the query belongs to a recognised pair and the required parameters are set.
+    """
+    values: Dict[str, Any] = {}
+    leftover = query
+    for m in _KEY_VALUE_RE.finditer(query):
+        key, raw = m.groups()
+        field = _FAST_PATH_ALIASES.get(key.lower(), key)
+        if field not in DatcomParams.model_fields:
+            return None
+        if raw.startswith('['):
+            items = [item for item in _LIST_SEPARATOR_RE.split(raw[1:-1]) if item]
+            if not all(_NUMBER_RE.fullmatch(item) for item in items):
+                return None
+            values[field] = [float(item) for item in items]
+        else:
+            values[field] = [float(raw)] if field in _FAST_PATH_LIST_FIELDS else float(raw)
+        leftover = leftover.replace(m.group(), " ", 1)
+    if not values:
+        return None
+    alpha_match = _ALPHA_RANGE_RE.search(leftover)
+    if alpha_match is not None:
+        values["alpha_degrees"] = _parse_alpha_range(alpha_match.group())
+        leftover = leftover.replace(alpha_match.group(), " ", 1)
+    if any(c.isdecimal() for c in leftover):
+        # Something numeric the pairs don't cover; let the LLM read it
+        return None
+    try:
+        params = _DATCOM_PARAMS_ADAPTER.validate_python(values)
+    except ValidationError:
+        return None
+    return params if _has_required_params(params) else None
+
+# Structural JSON tokens: braces, string quotes, and escape sequences inside strings
+_JSON_TOKEN_RE = re.compile(r'[{}"]|\\.', re.DOTALL)
+
+def _find_json_object(text: str) -> Optional[str]:
+    """
+    Returns the first balanced {...} object in text, or None if there is none.
+
+    Braces inside JSON strings are ignored, and anything after the object
+    closes (trailing prose, a second object) is left out.
+    """
+    start = text.find('{')
+    if start < 0:
+        return None
+    depth = 0
+    in_string = False
+    for m in _JSON_TOKEN_RE.finditer(text, start):
+        token = m.group()
+        if token == '"':
+            in_string = not in_string
+        elif in_string:
+            continue
+        elif token == '{':
+            depth += 1
+        elif token == '}':
+            depth -= 1
+            if depth == 0:
+                return text[start:m.end()]
+    return None
+
+# Distinct queries whose extraction results are kept in memory per extractor
+EXTRACTION_MEMO_SIZE = 512
+
+# Parsed once at import; the template is identical for every extractor
+PARAM_EXTRACTION_TEMPLATE = ChatPromptTemplate.from_messages([
+    ("system", PARAM_EXTRACTION_SYSTEM_PROMPT),
+    ("human", "{query}"),
+])
+
+# Built extraction chains for the most recently used LLM clients, so nodes
+# recreated per session/request reuse them. Keyed by id(llm); the stored llm
+# reference keeps the id from being recycled while the entry exists.
+_CHAIN_CACHE_SIZE = 16
+_CHAIN_CACHE: "OrderedDict[int, Tuple[ChatOpenAI, Runnable, Runnable]]" = OrderedDict()
+_CHAIN_CACHE_LOCK = threading.Lock()
+
+def _extraction_chains(llm: "ChatOpenAI") -> Tuple[Runnable, Runnable]:
+    """Returns the (structured output, free text) extraction chains for llm."""
+    with _CHAIN_CACHE_LOCK:
+        entry = _CHAIN_CACHE.get(id(llm))
+        if entry is not None and entry[0] is llm:
+            _CHAIN_CACHE.move_to_end(id(llm))
+            return entry[1], entry[2]
+        # Extraction is cached, so it must be deterministic whatever temperature
+        # the shared client uses for answering
+        update: Dict[str, Any] = {"temperature": 0}
+        cache_key = os.environ.get("EXTRACTION_PROMPT_CACHE_KEY")
+        if cache_key:
+            # OpenAI routes requests sharing a prompt_cache_key to the same prompt cache
+            update["extra_body"] = {**(llm.extra_body or {}), "prompt_cache_key": cache_key}
+        model = llm.model_copy(update=update)
+        structured_chain = PARAM_EXTRACTION_TEMPLATE | model.with_structured_output(DatcomParams, method="json_schema", strict=True)
+        text_chain = PARAM_EXTRACTION_TEMPLATE | model | StrOutputParser()
+        _CHAIN_CACHE[id(llm)] = (llm, structured_chain, text_chain)
+        if len(_CHAIN_CACHE) > _CHAIN_CACHE_SIZE:
+            _CHAIN_CACHE.popitem(last=False)
+        return structured_chain, text_chain
+
+def _normalize_query(query: str) -> str:
+    """Collapses whitespace so queries differing only in spacing share cache entries."""
+    return " ".join(query.split())
+
+def _create_param_extractor(llm: "ChatOpenAI", cache_dir: Optional[str] = None) -> Runnable:
+    """
+    Creates a runnable that extracts DATCOM parameters from a query.
+
+    Uses schema-constrained structured output when the endpoint supports it, and
+    falls back to scanning free-text output for a JSON object when it does not.
+    Queries are whitespace-normalised first; invoke() and ainvoke() share one
+    in-memory cache and one set of in-flight extractions. If cache_dir (or the EXTRACTION_CACHE_DIR environment variable)
+    is set, results are also cached on disk across runs.
+    """
+    # Imported here rather than at module level: openai is slow to import
+    from openai import BadRequestError
+
+    cache_dir = cache_dir or os.environ.get("EXTRACTION_CACHE_DIR")
+    disk_cache = ExtractionCache(cache_dir) if cache_dir else None
+    model_name = getattr(llm, "model_name", "") or ""
+    structured_chain, text_chain = _extraction_chains(llm)
+    structured_supported = True
+
+    def _parse_text(result: str) -> Optional[DatcomParams]:
+        result = result.strip()
+        json_str = _find_json_object(result)
+        if json_str is None:
+            log(f"Warning: No JSON found in extraction result: {result}")
+            return None
+        return _DATCOM_PARAMS_ADAPTER.validate_python(orjson.loads(json_str))
+
+    def _structured_failed(e: Exception):
+        nonlocal structured_supported
+        if isinstance(e, BadRequestError):
+            # The endpoint rejects response_format; stop asking for it
+            structured_supported = False
+            log(f"Warning: Structured output unsupported, using JSON text extraction: {e}")
+        else:
+            log(f"Warning: Structured extraction failed, retrying as JSON text: {e}")
+
+    def _apply_alpha_range(query: str, params: Optional[DatcomParams]) -> Optional[DatcomParams]:
+        alphas = _parse_alpha_range(query) if params is not None else None
+        if alphas:
+            params.alpha_degrees = alphas
+        return params
+
+    def _extract_with_llm(query: str) -> Optional[DatcomParams]:
+        if structured_supported:
+            try:
+                return _apply_alpha_range(query, structured_chain.invoke({"query": query}))
+            except (BadRequestError, ValidationError, OutputParserException) as e:
+                _structured_failed(e)
+        return _apply_alpha_range(query, _parse_text(text_chain.invoke({"query": query})))
+
+    async def _aextract_with_llm(query: str) -> Optional[DatcomParams]:
+        if structured_supported:
+            try:
+                return _apply_alpha_range(query, await structured_chain.ainvoke({"query": query}))
+            except (BadRequestError, ValidationError, OutputParserException) as e:
+                _structured_failed(e)
+        return _apply_alpha_range(query, _parse_text(await text_chain.ainvoke({"query": query})))
+
+    def _disk_key(query: str) -> str:
+        return ExtractionCache.make_key(PROMPT_VERSION, model_name, query)
+
+    def _from_disk(query: str) -> Optional[DatcomParams]:
+        if disk_cache is None:
+            return None
+        entry = disk_cache.get(_disk_key(query))
+        if entry is None:
+            return None
+        log("Using cached parameter extraction")
+        return _DATCOM_PARAMS_ADAPTER.validate_python(entry["params"])
+
+    def _to_disk(query: str, params: Optional[DatcomParams]) -> Optional[DatcomParams]:
+        if params is None:
+            # Don't persist failed extractions
+            return None
+        if disk_cache is not None:
+            disk_cache.set(_disk_key(query), {
+                "model": model_name,
+                "prompt_version": PROMPT_VERSION,
+                "query": query,
+                "params": params.model_dump(),
+            })
+        return params
+
+    # Finished extractions (LRU) and ones still running; a query being extracted
+    # by one caller is awaited by the others instead of hitting the LLM again.
+    memo: "OrderedDict[str, DatcomParams]" = OrderedDict()
+    inflight: Dict[str, Future] = {}
+    lock = threading.Lock()
+
+    def _claim(query: str) -> Tuple[Optional[DatcomParams], Optional[Future], bool]:
+        """Returns (memoised result, in-flight future, whether the caller must run the extraction)."""
+        with lock:
+            if query in memo:
+                memo.move_to_end(query)
+                return memo[query], None, False
+            future = inflight.get(query)
+            if future is not None:
+                return None, future, False
+            future = inflight[query] = Future()
+            return None, future, True
+
+    def _settle(query: str, future: Future, params: Optional[DatcomParams] = None, error: Optional[BaseException] = None):
+        with lock:
+            del inflight[query]
+            # Failed extractions (None) aren't memoised, so the next identical query retries the LLM
+            if error is None and params is not None:
+                memo[query] = params
+                if len(memo) > EXTRACTION_MEMO_SIZE:
+                    memo.popitem(last=False)
+        if error is None:
+            future.set_result(params)
+        else:
+            future.set_exception(error)
 
-def _create_param_extractor(llm: ChatOpenAI) -> callable:
-    """Creates a function to extract DATCOM parameters from a query."""
-    prompt = ChatPromptTemplate.from_template(PARAM_EXTRACTION_PROMPT)
-    chain = prompt | llm | StrOutputParser()
-    
     def _extract(query: str) -> DatcomParams:
+        query = _normalize_query(query)
+        fast = _regex_extract(query)
+        if fast is not None:
+            log("Parsed key=value parameters without the LLM")
+            return fast
         try:
-            result = chain.invoke({"query": query})
-            # Try to extract JSON from the response
-            result = result.strip()
-            
-            # Find JSON object in response
-            if '{' in result:
-                start = result.index('{')
-                end = result.rindex('}') + 1
-                json_str = result[start:end]
-                params_dict = json.loads(json_str)
-                return DatcomParams(**params_dict)
-            else:
-                log(f"Warning: No JSON found in extraction result: {result}")
+            params, future, owner = _claim(query)
+            if params is None:
+                if owner:
+                    try:
+                        _settle(query, future, _from_disk(query) or _to_disk(query, _extract_with_llm(query)))
+                    except BaseException as e:
+                        _settle(query, future, error=e)
+                params = future.result()
+            if params is None:
                 return DatcomParams()
+            # Copy: the sequence node fills in estimated tail values on the instance
+            return params.model_copy()
+        except Exception as e:
+            log(f"Warning: Failed to extract parameters: {e}")
+            return DatcomParams()
+
+    async def _aextract(query: str) -> DatcomParams:
+        query = _normalize_query(query)
+        fast = _regex_extract(query)
+        if fast is not None:
+            log("Parsed key=value parameters without the LLM")
+            return fast
+        try:
+            params, future, owner = _claim(query)
+            if params is None:
+                if owner:
+                    try:
+                        _settle(query, future, _from_disk(query) or _to_disk(query, await _aextract_with_llm(query)))
+                    except asyncio.CancelledError:
+                        # Don't cancel the other callers waiting on this extraction
+                        _settle(query, future, error=RuntimeError("Parameter extraction was cancelled"))
+                        raise
+                    except BaseException as e:
+                        _settle(query, future, error=e)
+                params = await asyncio.wrap_future(future)
+            if params is None:
+                return DatcomParams()
+            return params.model_copy()
         except Exception as e:
             log(f"Warning: Failed to extract parameters: {e}")
             return DatcomParams()
-    
-    return _extract
+
+    return RunnableLambda(_extract, afunc=_aextract, name="datcom_param_extractor")
 
 # --- DATCOM Output Formatter ---
 
+def _parse_tool_content(content: Any) -> Optional[dict]:
+    """Decodes a tool response, returning None for errors or non-object payloads."""
+    if isinstance(content, (str, bytes)):
+        try:
+            content = orjson.loads(content)
+        except orjson.JSONDecodeError:
+            return None
+    if isinstance(content, dict) and 'error' not in content:
+        return content
+    return None
+
+def _join(values) -> str:
+    return ', '.join(map(str, values))
+
 def _build_datcom_format(tool_responses: List[Dict[str, Any]], question: str) -> str:
     """Build DATCOM .dat format output from tool responses."""
     aircraft_name = "CUSTOM AIRCRAFT" # Simplified for now
-    
-    namelists = {}
-    for tr in tool_responses:
-        try:
-            data = json.loads(tr['content']) if isinstance(tr['content'], str) else tr['content']
-            if isinstance(data, dict) and 'error' not in data:
-                namelists[tr['name']] = data
-        except (json.JSONDecodeError, TypeError):
-            pass
-
-    lines = []
-    lines.append(f"CASEID ----- {aircraft_name} -----")
-    
-    if 'generate_fltcon_matrix' in namelists:
-        flt = namelists['generate_fltcon_matrix']
-        mach_str = ', '.join(map(str, flt.get('MACH', [])))
-        alpha_str = ', '.join(map(str, flt.get('ALSCHD', [])))
-        alt_str = ', '.join(map(str, flt.get('ALT', [])))
-        lines.append(f"$FLTCON NMACH={flt.get('NMACH', 1.0)},MACH(1)={mach_str},NALPHA={flt.get('NALPHA', 1.0)},ALSCHD(1)={alpha_str},")
-        lines.append(f" NALT={flt.get('NALT', 1.0)},ALT(1)={alt_str},")
-        lines.append(f" WT={flt.get('WT', 0.0)},LOOP={flt.get('LOOP', 1.0)}.$")
-
-    if 'calculate_synthesis_positions' in namelists:
-        syn = namelists['calculate_synthesis_positions']
-        lines.append(f"$SYNTHS XCG={syn.get('XCG', 0.0)},ZCG={syn.get('ZCG', 0.0)},XW={syn.get('XW', 0.0)},ZW={syn.get('ZW', 0.0)},ALIW={syn.get('ALIW', 0.0)},XH={syn.get('XH', 0.0)},")
-        lines.append(f" ZH={syn.get('ZH', 0.0)},ALIH={syn.get('ALIH', 0.0)},XV={syn.get('XV', 0.0)},ZV={syn.get('ZV', 0.0)}$")
-
-    if 'convert_wing_to_datcom' in namelists:
-        wing = namelists['convert_wing_to_datcom']
-        lines.append(f"$OPTINS SREF={wing.get('SREF', 0.0)}$")
-
-    if 'define_body_geometry' in namelists:
-        body = namelists['define_body_geometry']
-        x_vals = ', '.join(map(str, body.get('X', [])))
-        zu_vals = ', '.join(map(str, body.get('ZU', [])))
-        zl_vals = ', '.join(map(str, body.get('ZL', [])))
-        lines.append(f"$BODY NX={body.get('NX', 0.0)},METHOD={body.get('METHOD', 1)},")
-        lines.append(f" X(1)={x_vals},")
-        lines.append(f" ZU(1)={zu_vals},")
-        lines.append(f" ZL(1)={zl_vals}$")
-
-    if 'convert_wing_to_datcom' in namelists:
-        wing = namelists['convert_wing_to_datcom']
-        lines.append(wing.get('airfoil', 'NACA-W-4-2412'))
-        lines.append(f"$WGPLNF CHRDTP={wing.get('CHRDTP', 0.0)},SSPNOP={wing.get('SSPNOP', 0.0)},SSPNE={wing.get('SSPNE', 0.0)},SSPN={wing.get('SSPN', 0.0)},")
-        lines.append(f" CHRDBP={wing.get('CHRDBP', 0.0)},CHRDR={wing.get('CHRDR', 0.0)},SAVSI={wing.get('SAVSI', 0.0)},SAVSO={wing.get('SAVSO', 0.0)},CHSTAT={wing.get('CHSTAT', 0.25)},")
-        lines.append(f" TWISTA={wing.get('TWISTA', 0.0)},DHDADI={wing.get('DHDADI', 0.0)},DHDADO={wing.get('DHDADO', 0.0)},TYPE={wing.get('TYPE', 1.0)}.$")
+
+    parsed = ((tr['name'], _parse_tool_content(tr['content'])) for tr in tool_responses)
+    namelists = {name: data for name, data in parsed if data is not None}
+
+    lines = [f"CASEID ----- {aircraft_name} -----"]
+    append = lines.append
+
+    flt = namelists.get('generate_fltcon_matrix')
+    if flt is not None:
+        g = flt.get
+        append(f"$FLTCON NMACH={g('NMACH', 1.0)},MACH(1)={_join(g('MACH', ()))},NALPHA={g('NALPHA', 1.0)},ALSCHD(1)={_join(g('ALSCHD', ()))},")
+        append(f" NALT={g('NALT', 1.0)},ALT(1)={_join(g('ALT', ()))},")
+        append(f" WT={g('WT', 0.0)},LOOP={g('LOOP', 1.0)}.$")
+
+    syn = namelists.get('calculate_synthesis_positions')
+    if syn is not None:
+        g = syn.get
+        append(f"$SYNTHS XCG={g('XCG', 0.0)},ZCG={g('ZCG', 0.0)},XW={g('XW', 0.0)},ZW={g('ZW', 0.0)},ALIW={g('ALIW', 0.0)},XH={g('XH', 0.0)},")
+        append(f" ZH={g('ZH', 0.0)},ALIH={g('ALIH', 0.0)},XV={g('XV', 0.0)},ZV={g('ZV', 0.0)}$")
+
+    wing = namelists.get('convert_wing_to_datcom')
+    if wing is not None:
+        append(f"$OPTINS SREF={wing.get('SREF', 0.0)}$")
+
+    body = namelists.get('define_body_geometry')
+    if body is not None:
+        g = body.get
+        append(f"$BODY NX={g('NX', 0.0)},METHOD={g('METHOD', 1)},")
+        append(f" X(1)={_join(g('X', ()))},")
+        append(f" ZU(1)={_join(g('ZU', ()))},")
+        append(f" ZL(1)={_join(g('ZL', ()))}$")
+
+    # Same wing binding as OPTINS; the planform goes after $BODY in the deck
+    if wing is not None:
+        g = wing.get
+        append(g('airfoil', 'NACA-W-4-2412'))
+        append(f"$WGPLNF CHRDTP={g('CHRDTP', 0.0)},SSPNOP={g('SSPNOP', 0.0)},SSPNE={g('SSPNE', 0.0)},SSPN={g('SSPN', 0.0)},")
+        append(f" CHRDBP={g('CHRDBP', 0.0)},CHRDR={g('CHRDR', 0.0)},SAVSI={g('SAVSI', 0.0)},SAVSO={g('SAVSO', 0.0)},CHSTAT={g('CHSTAT', 0.25)},")
+        append(f" TWISTA={g('TWISTA', 0.0)},DHDADI={g('DHDADI', 0.0)},DHDADO={g('DHDADO', 0.0)},TYPE={g('TYPE', 1.0)}.$")
 
     # Horizontal tail
-    if 'convert_tail_to_datcom_htail' in namelists:
-        htail = namelists['convert_tail_to_datcom_htail']
-        lines.append(htail.get('airfoil', 'NACA-H-4-0012'))
-        lines.append(f"$HTPLNF CHRDTP={htail.get('CHRDTP', 0.0)},SSPNE={htail.get('SSPNE', 0.0)},SSPN={htail.get('SSPN', 0.0)},")
-        lines.append(f" CHRDR={htail.get('CHRDR', 0.0)},SAVSI={htail.get('SAVSI', 0.0)},CHSTAT={htail.get('CHSTAT', 0.0)},")
-        lines.append(f" TWISTA={htail.get('TWISTA', 0.0)},DHDADI={htail.get('DHDADI', 0.0)},TYPE={htail.get('TYPE', 1.0)}.$")
+    htail = namelists.get('convert_tail_to_datcom_htail')
+    if htail is not None:
+        g = htail.get
+        append(g('airfoil', 'NACA-H-4-0012'))
+        append(f"$HTPLNF CHRDTP={g('CHRDTP', 0.0)},SSPNE={g('SSPNE', 0.0)},SSPN={g('SSPN', 0.0)},")
+        append(f" CHRDR={g('CHRDR', 0.0)},SAVSI={g('SAVSI', 0.0)},CHSTAT={g('CHSTAT', 0.0)},")
+        append(f" TWISTA={g('TWISTA', 0.0)},DHDADI={g('DHDADI', 0.0)},TYPE={g('TYPE', 1.0)}.$")
 
     # Vertical tail
-    if 'convert_tail_to_datcom_vtail' in namelists:
-        vtail = namelists['convert_tail_to_datcom_vtail']
-        lines.append(vtail.get('airfoil', 'NACA-V-4-0012'))
-        lines.append(f"$VTPLNF CHRDTP={vtail.get('CHRDTP', 0.0)},SSPNE={vtail.get('SSPNE', 0.0)},SSPN={vtail.get('SSPN', 0.0)},")
-        lines.append(f" CHRDR={vtail.get('CHRDR', 0.0)},SAVSI={vtail.get('SAVSI', 0.0)},CHSTAT={vtail.get('CHSTAT', 0.0)},TYPE={vtail.get('TYPE', 1.0)}.$")
+    vtail = namelists.get('convert_tail_to_datcom_vtail')
+    if vtail is not None:
+        g = vtail.get
+        append(g('airfoil', 'NACA-V-4-0012'))
+        append(f"$VTPLNF CHRDTP={g('CHRDTP', 0.0)},SSPNE={g('SSPNE', 0.0)},SSPN={g('SSPN', 0.0)},")
+        append(f" CHRDR={g('CHRDR', 0.0)},SAVSI={g('SAVSI', 0.0)},CHSTAT={g('CHSTAT', 0.0)},TYPE={g('TYPE', 1.0)}.$")
 
     lines.extend(["DIM FT", "BUILD", "PLOT", "NEXT CASE"])
     return "\n".join(lines)
 
 # --- DATCOM Sequence Node ---
 
-def create_datcom_sequence_node(llm: ChatOpenAI) -> callable:
-    """
-    Creates a node that runs a fixed sequence of DATCOM tools.
-    """
-    param_extractor = _create_param_extractor(llm)
-    tools = {t.name: t for t in create_datcom_calculator_tools()}
+@lru_cache(maxsize=1)
+def _get_datcom_tools() -> Dict[str, Any]:
+    """Name -> tool lookup, built on first use and shared by every node (the tools are stateless)."""
+    # Imported here: the tool package also loads the retrieval tools' vector store dependencies
+    from .tool import create_datcom_calculator_tools
+    return {t.name: t for t in create_datcom_calculator_tools()}
 
-    def datcom_sequence_node(state: GraphState) -> dict:
-        log("--- RUNNING DATCOM FIXED SEQUENCE ---")
-        question = state["question"]
-        
-        log("Extracting parameters from query...")
-        params = param_extractor(question)
-        log(f"Extracted parameters: {params}")
-
-        # Validate if enough concrete parameters were provided for a generation task
-        has_wing_params = all([params.wing_S, params.wing_A, params.wing_lambda, params.wing_sweep_angle])
-        has_flight_params = all([params.mach_numbers, params.altitudes])
-
-        if not (has_wing_params and has_flight_params):
-            log("Query is too abstract. Asking user for more specific parameters.")
-            clarification_message = ("""
+CLARIFICATION_MESSAGE = """
 無法處理抽象的生成請求。
 
 請提供更具體的基礎參數來開始模擬。建議至少提供以下幾項：
@@ -225,158 +525,297 @@ def create_datcom_sequence_node(llm: ChatOpenAI) -> callable:
   - `altitudes`: 飛行高度 (例如: [10000] ft)
 
 請在您的下一個請求中包含這些參數。
-""")
-            return {"generation": clarification_message}
-
-        tool_responses = []
-
-        # Call tools in a fixed, reliable sequence
-        log("Calling convert_wing_to_datcom")
-        response = tools['convert_wing_to_datcom'].invoke({
-            "S": params.wing_S, "A": params.wing_A, 
-            "lambda_": params.wing_lambda, "sweep_angle": params.wing_sweep_angle
-        })
-        tool_responses.append({"name": "convert_wing_to_datcom", "content": response})
-
-        log("Calling generate_fltcon_matrix")
-        # Convert alpha_degrees list to alpha_range tuple if provided as list
-        if params.alpha_degrees:
-            # If we have a list, infer the range
-            alphas = sorted(params.alpha_degrees)
-            if len(alphas) > 1:
-                alpha_start = alphas[0]
-                alpha_end = alphas[-1]
-                # Try to infer step size
-                alpha_step = alphas[1] - alphas[0] if len(alphas) > 1 else 2.0
-                alpha_range = (alpha_start, alpha_end, alpha_step)
-            else:
-                # Single value, use as both start and end with step=1
-                alpha_range = (alphas[0], alphas[0], 1.0)
+"""
+
+# Fuselage stations: nose tip, nose end, two constant-section points, tail start, mid-tail, tail end.
+# Radius at each station as a fraction of the maximum radius (pointed nose and tail).
+_BODY_SECTION_FRACTIONS = np.array([0.33, 0.67])
+_BODY_RADIUS_PROFILE = np.array([0.0, 1.0, 1.0, 1.0, 1.0, 0.5, 0.0])
+
+def _body_coordinates(length: float, max_diameter: float, nose_ratio: float, tail_ratio: float) -> Tuple[List[float], List[float], List[float]]:
+    """
+    Builds an axisymmetric fuselage from its length, diameter and cone ratios.
+
+    Returns:
+        (X stations, upper surface Z, lower surface Z) lists for define_body_geometry.
+    """
+    nose_len = length * nose_ratio
+    tail_len = length * tail_ratio
+    section_end = length - tail_len
+
+    x = np.empty(len(_BODY_RADIUS_PROFILE))
+    x[0] = 0.0
+    x[1] = nose_len
+    x[2:4] = nose_len + (section_end - nose_len) * _BODY_SECTION_FRACTIONS
+    x[4] = section_end
+    x[5] = section_end + tail_len * 0.5
+    x[6] = length
+
+    zu = (max_diameter / 2.0) * _BODY_RADIUS_PROFILE
+    return x.tolist(), zu.tolist(), (-zu).tolist()
+
+# (field prefix, tool component, is_vertical) for each tail, in output order
+_TAILS = (("htail", "horizontal_tail", False), ("vtail", "vertical_tail", True))
+_TAIL_FIELDS = ("S", "A", "lambda", "sweep_angle")
+
+# Typical tail sizing relative to the wing: (area fraction, aspect ratio factor,
+# fallback aspect ratio, fallback sweep angle)
+_TAIL_ESTIMATES = {
+    "htail": (0.25, 0.9, 3.5, 30.0),
+    "vtail": (0.18, 1.2, 1.5, 40.0),
+}
+
+def _estimate_missing_tails(params: DatcomParams):
+    """Fills in wing-scaled geometry for each tail whose area the query left out."""
+    if not params.wing_S:
+        return
+    for prefix, (area_fraction, aspect_factor, default_A, default_sweep) in _TAIL_ESTIMATES.items():
+        if getattr(params, f"{prefix}_S") is not None:
+            continue
+        S = params.wing_S * area_fraction
+        A = params.wing_A * aspect_factor if params.wing_A else default_A
+        setattr(params, f"{prefix}_S", S)
+        setattr(params, f"{prefix}_A", A)
+        setattr(params, f"{prefix}_lambda", params.wing_lambda if params.wing_lambda else 0.4)
+        setattr(params, f"{prefix}_sweep_angle", params.wing_sweep_angle if params.wing_sweep_angle else default_sweep)
+        log(f"Auto-estimated {prefix}: S={S}, A={A}")
+
+def _has_required_params(params: DatcomParams) -> bool:
+    """
+    Checks that enough concrete parameters were provided for a generation task.
+
+    Area and aspect ratio must be positive; taper and sweep only need to be
+    present, since 0 is meaningful there (e.g. an unswept wing).
+    """
+    has_wing_params = (
+        (params.wing_S or 0) > 0 and (params.wing_A or 0) > 0
+        and params.wing_lambda is not None and params.wing_sweep_angle is not None
+    )
+    has_flight_params = bool(params.mach_numbers) and bool(params.altitudes)
+    return has_wing_params and has_flight_params
+
+# Words that suggest a query describes geometry or flight conditions, even when
+# it is short on digits
+_PARAM_KEYWORDS = ("wing", "mach", "altitude", "機翼", "馬赫", "高度")
+
+def _obviously_lacks_params(question: str) -> bool:
+    """
+    Cheap pre-check run before extraction: True when the query has fewer than
+    two numbers and no parameter keywords, so no LLM call could find the
+    required wing and flight values in it.
+    """
+    if len(_NUMBER_RE.findall(question)) >= 2:
+        return False
+    lowered = question.lower()
+    return not any(keyword in lowered for keyword in _PARAM_KEYWORDS)
+
+# FLTCON fallbacks when the query gives no angles of attack or weight
+DEFAULT_ALPHA_RANGE = (-2.0, 10.0, 2.0)
+DEFAULT_WEIGHT = 40000.0
+
+def _alpha_range(alpha_degrees: Optional[List[float]]) -> Tuple[float, float, float]:
+    """
+    Converts the extracted angles of attack into generate_fltcon_matrix's
+    (start, end, step) range, inferring the step from the two smallest angles.
+    A single angle becomes (a, a, 1.0).
+    """
+    if not alpha_degrees:
+        return DEFAULT_ALPHA_RANGE
+    alphas = sorted(alpha_degrees)
+    if len(alphas) == 1:
+        return (alphas[0], alphas[0], 1.0)
+    return (alphas[0], alphas[-1], alphas[1] - alphas[0])
+
+def _plan_tool_calls(params: DatcomParams) -> List[Tuple[str, str, Dict[str, Any]]]:
+    """
+    Resolves the tool calls for a request, estimating missing tail parameters.
+
+    Returns:
+        (response name, tool name, arguments) tuples in the fixed output order.
+        The calls do not depend on each other's results.
+    """
+    tool_calls = []
+
+    log("Queueing convert_wing_to_datcom")
+    tool_calls.append(("convert_wing_to_datcom", "convert_wing_to_datcom", {
+        "S": params.wing_S, "A": params.wing_A, 
+        "lambda_": params.wing_lambda, "sweep_angle": params.wing_sweep_angle
+    }))
+
+    log("Queueing generate_fltcon_matrix")
+    tool_calls.append(("generate_fltcon_matrix", "generate_fltcon_matrix", {
+        "mach_numbers": params.mach_numbers, 
+        "altitudes": params.altitudes,
+        "alpha_range": _alpha_range(params.alpha_degrees),
+        "weight": params.weight or DEFAULT_WEIGHT
+    }))
+
+    # A position of 0 (at the nose) is valid, so test for presence, not truthiness
+    if params.xcg is not None and params.xw is not None and params.xh is not None:
+        log("Queueing calculate_synthesis_positions")
+        # User provided explicit positions, but tool needs fuselage_length
+        # Use fuselage_length if available, otherwise estimate it from the
+        # furthest position plus some margin
+        fuselage_len = params.fuselage_length or max(params.xcg, params.xw, params.xh) * 1.15
+
+        # Calculate percentages from user's explicit positions
+        if fuselage_len > 0:
+            cg_percent, wing_percent, htail_percent = (
+                params.xcg / fuselage_len, params.xw / fuselage_len, params.xh / fuselage_len)
         else:
-            # Default range if not specified
-            alpha_range = (-2.0, 10.0, 2.0)
-        
-        response = tools['generate_fltcon_matrix'].invoke({
-            "mach_numbers": params.mach_numbers, 
-            "altitudes": params.altitudes,
-            "alpha_range": alpha_range,
-            "weight": params.weight or 40000.0
-        })
-        tool_responses.append({"name": "generate_fltcon_matrix", "content": response})
-
-        if params.xcg and params.xw and params.xh:
-            log("Calling calculate_synthesis_positions")
-            # User provided explicit positions, but tool needs fuselage_length
-            # Use fuselage_length if available, otherwise estimate
-            if params.fuselage_length:
-                fuselage_len = params.fuselage_length
-            else:
-                # Estimate fuselage length from the furthest position + some margin
-                fuselage_len = max(params.xcg or 0, params.xw or 0, params.xh or 0) * 1.15
-            
-            # Calculate percentages from user's explicit positions
-            cg_percent = params.xcg / fuselage_len if fuselage_len > 0 else 0.35
-            wing_percent = params.xw / fuselage_len if fuselage_len > 0 else 0.40
-            htail_percent = params.xh / fuselage_len if fuselage_len > 0 else 0.90
-            
-            response = tools['calculate_synthesis_positions'].invoke({
-                "fuselage_length": fuselage_len,
-                "cg_position_percent": cg_percent,
-                "wing_position_percent": wing_percent,
-                "htail_position_percent": htail_percent
-            })
-            tool_responses.append({"name": "calculate_synthesis_positions", "content": response})
-
-        # Body Geometry Logic - Calculate coordinate arrays
-        if params.fuselage_length and params.max_diameter:
-            log("Calling define_body_geometry with calculated coordinates")
-            
-            # Get nose and tail cone lengths
-            nose_len = params.fuselage_length * params.nose_cone_length_ratio
-            tail_len = params.fuselage_length * params.tail_cone_length_ratio
-            constant_section_start = nose_len
-            constant_section_end = params.fuselage_length - tail_len
-            
-            # Build coordinate arrays for fuselage stations
-            # Using 7 stations: nose tip, nose end, mid-front, center, mid-rear, tail start, tail end
-            max_radius = params.max_diameter / 2.0
-            
-            x_coords = [
-                0.0,                           # Nose tip
-                nose_len,                      # End of nose cone
-                constant_section_start + (constant_section_end - constant_section_start) * 0.33,
-                constant_section_start + (constant_section_end - constant_section_start) * 0.67,
-                constant_section_end,          # Start of tail cone
-                constant_section_end + tail_len * 0.5,
-                params.fuselage_length         # Tail end
-            ]
-            
-            # Upper surface Z-coordinates (assuming axisymmetric body: ZU = +radius)
-            zu_coords = [
-                0.0,                           # Nose tip (pointed)
-                max_radius,                    # Full diameter at nose end
-                max_radius,                    # Constant section
-                max_radius,
-                max_radius,                    # Constant section end
-                max_radius * 0.5,              # Tail cone taper
-                0.0                            # Tail end (pointed)
-            ]
-            
-            # Lower surface Z-coordinates (symmetric: ZL = -radius)
-            zl_coords = [z * -1.0 for z in zu_coords]
-            
-            response = tools['define_body_geometry'].invoke({
-                "x_coords": x_coords,
-                "zu_coords": zu_coords,
-                "zl_coords": zl_coords
-            })
-            tool_responses.append({"name": "define_body_geometry", "content": response})
-
-        # Horizontal Tail Logic - Auto-estimate if not provided
-        if params.htail_S is None and params.wing_S:
-            # Typical htail is ~25% of wing area
-            params.htail_S = params.wing_S * 0.25
-            params.htail_A = params.wing_A * 0.9 if params.wing_A else 3.5
-            params.htail_lambda = params.wing_lambda if params.wing_lambda else 0.4
-            params.htail_sweep_angle = params.wing_sweep_angle if params.wing_sweep_angle else 30.0
-            log(f"Auto-estimated htail: S={params.htail_S}, A={params.htail_A}")
-
-        if params.htail_S and params.htail_A:
-            log("Calling convert_tail_to_datcom for horizontal tail")
-            response = tools['convert_tail_to_datcom'].invoke({
-                "component": "horizontal_tail",
-                "S": params.htail_S,
-                "A": params.htail_A,
-                "lambda_": params.htail_lambda,
-                "sweep_angle": params.htail_sweep_angle,
-                "is_vertical": False
-            })
-            tool_responses.append({"name": "convert_tail_to_datcom_htail", "content": response})
-
-        # Vertical Tail Logic - Auto-estimate if not provided
-        if params.vtail_S is None and params.wing_S:
-            # Typical vtail is ~18% of wing area
-            params.vtail_S = params.wing_S * 0.18
-            params.vtail_A = params.wing_A * 1.2 if params.wing_A else 1.5
-            params.vtail_lambda = params.wing_lambda if params.wing_lambda else 0.4
-            params.vtail_sweep_angle = params.wing_sweep_angle if params.wing_sweep_angle else 40.0
-            log(f"Auto-estimated vtail: S={params.vtail_S}, A={params.vtail_A}")
-
-        if params.vtail_S and params.vtail_A:
-            log("Calling convert_tail_to_datcom for vertical tail")
-            response = tools['convert_tail_to_datcom'].invoke({
-                "component": "vertical_tail",
-                "S": params.vtail_S,
-                "A": params.vtail_A,
-                "lambda_": params.vtail_lambda,
-                "sweep_angle": params.vtail_sweep_angle,
-                "is_vertical": True
-            })
-            tool_responses.append({"name": "convert_tail_to_datcom_vtail", "content": response})
+            cg_percent, wing_percent, htail_percent = 0.35, 0.40, 0.90
+
+        tool_calls.append(("calculate_synthesis_positions", "calculate_synthesis_positions", {
+            "fuselage_length": fuselage_len,
+            "cg_position_percent": cg_percent,
+            "wing_position_percent": wing_percent,
+            "htail_position_percent": htail_percent
+        }))
+
+    # Body Geometry Logic - Calculate coordinate arrays
+    if params.fuselage_length and params.max_diameter:
+        log("Queueing define_body_geometry with calculated coordinates")
+
+        x_coords, zu_coords, zl_coords = _body_coordinates(
+            params.fuselage_length, params.max_diameter,
+            params.nose_cone_length_ratio, params.tail_cone_length_ratio
+        )
+
+        tool_calls.append(("define_body_geometry", "define_body_geometry", {
+            "x_coords": x_coords,
+            "zu_coords": zu_coords,
+            "zl_coords": zl_coords
+        }))
+
+    # Tails - auto-estimated from the wing when not provided
+    _estimate_missing_tails(params)
+    for prefix, component, is_vertical in _TAILS:
+        S, A, lambda_, sweep_angle = (getattr(params, f"{prefix}_{field}") for field in _TAIL_FIELDS)
+        if S and A:
+            log(f"Queueing convert_tail_to_datcom for {component.replace('_', ' ')}")
+            tool_calls.append((f"convert_tail_to_datcom_{prefix}", "convert_tail_to_datcom", {
+                "component": component,
+                "S": S,
+                "A": A,
+                "lambda_": lambda_,
+                "sweep_angle": sweep_angle,
+                "is_vertical": is_vertical
+            }))
+
+    return tool_calls
+
+def _collect_tool_responses(tool_calls: List[Tuple[str, str, Dict[str, Any]]], results: List[Any]) -> List[Dict[str, Any]]:
+    """Pairs results with their response names; a raised exception becomes an error payload."""
+    tool_responses = []
+    for (name, _, _), result in zip(tool_calls, results):
+        if isinstance(result, Exception):
+            log(f"Warning: Tool call {name} failed: {result}")
+            result = {"error": str(result)}
+        tool_responses.append({"name": name, "content": result})
+    return tool_responses
+
+# Query sent by the optional warm-up call; it contains no parameters
+_WARM_UP_QUERY = "warmup: no params"
+
+def _warm_up_extraction(llm: "ChatOpenAI"):
+    """
+    Sends one throwaway extraction request in a background thread so the
+    provider caches the static system prompt before the first real query.
+
+    Goes through the chains directly, bypassing the extractor's memo and disk
+    cache. Failures are only logged.
+    """
+    from openai import BadRequestError
+
+    structured_chain, text_chain = _extraction_chains(llm)
 
+    def _run():
+        try:
+            try:
+                structured_chain.invoke({"query": _WARM_UP_QUERY})
+            except BadRequestError:
+                text_chain.invoke({"query": _WARM_UP_QUERY})
+            log("Extraction prompt warm-up finished")
+        except Exception as e:
+            log(f"Warning: Extraction prompt warm-up failed: {e}")
+
+    threading.Thread(target=_run, name="datcom-prompt-warmup", daemon=True).start()
+
+def create_datcom_sequence_node(llm: "ChatOpenAI", warm_up: Optional[bool] = None) -> Runnable:
+    """
+    Creates a node that runs a fixed sequence of DATCOM tools.
+
+    The node runs under both graph.invoke() and graph.ainvoke(). The tool calls
+    are independent: synchronously they run one after another (each is plain
+    arithmetic), asynchronously with asyncio.gather. Results keep the fixed order.
+
+    If warm_up is true (default: the DATCOM_PROMPT_WARMUP environment variable
+    is set to 1/true), one extraction request is sent in the background right
+    away so the first user query hits the provider's prompt cache.
+    """
+    if warm_up is None:
+        warm_up = os.environ.get("DATCOM_PROMPT_WARMUP", "").strip().lower() in ("1", "true", "yes")
+    if warm_up:
+        _warm_up_extraction(llm)
+    param_extractor = _create_param_extractor(llm)
+    tools = _get_datcom_tools()
+
+    def _invoke_tool(tool_name: str, args: Dict[str, Any]) -> Any:
+        try:
+            return tools[tool_name].invoke(args)
+        except Exception as e:
+            return e
+
+    def _finish(question: str, tool_calls: List[Tuple[str, str, Dict[str, Any]]], results: List[Any]) -> dict:
+        tool_responses = _collect_tool_responses(tool_calls, results)
         log("Formatting final DATCOM file...")
         final_answer = _build_datcom_format(tool_responses, question)
-        
         return {"generation": final_answer}
 
-    return datcom_sequence_node
+    def datcom_sequence_node(state: GraphState) -> dict:
+        log("--- RUNNING DATCOM FIXED SEQUENCE ---")
+        question = state["question"]
+
+        if _obviously_lacks_params(question):
+            log("Query has no parameters. Asking user for more specific parameters.")
+            return {"generation": CLARIFICATION_MESSAGE}
+
+        log("Extracting parameters from query...")
+        params = param_extractor.invoke(question)
+        log("Extracted parameters: %s", params)
+
+        if not _has_required_params(params):
+            log("Query is too abstract. Asking user for more specific parameters.")
+            return {"generation": CLARIFICATION_MESSAGE}
+
+        tool_calls = _plan_tool_calls(params)
+        log(f"Calling {len(tool_calls)} DATCOM tools")
+        results = [_invoke_tool(tool_name, args) for _, tool_name, args in tool_calls]
+        return _finish(question, tool_calls, results)
+
+    async def adatcom_sequence_node(state: GraphState) -> dict:
+        log("--- RUNNING DATCOM FIXED SEQUENCE ---")
+        question = state["question"]
+
+        if _obviously_lacks_params(question):
+            log("Query has no parameters. Asking user for more specific parameters.")
+            return {"generation": CLARIFICATION_MESSAGE}
+
+        log("Extracting parameters from query...")
+        params = await param_extractor.ainvoke(question)
+        log("Extracted parameters: %s", params)
+
+        if not _has_required_params(params):
+            log("Query is too abstract. Asking user for more specific parameters.")
+            return {"generation": CLARIFICATION_MESSAGE}
+
+        tool_calls = _plan_tool_calls(params)
+        log(f"Calling {len(tool_calls)} DATCOM tools")
+        # gather (not as_completed) keeps results in the order the formatter expects
+        results = await asyncio.gather(
+            *(tools[tool_name].ainvoke(args) for _, tool_name, args in tool_calls),
+            return_exceptions=True,
+        )
+        return _finish(question, tool_calls, results)
+
+    return RunnableLambda(datcom_sequence_node, afunc=adatcom_sequence_node, name="datcom_sequence_node")
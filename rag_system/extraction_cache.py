@@ -0,0 +1,57 @@
+"""
+Content-addressable disk cache for LLM parameter extractions.
+
+Each entry is one JSON file named after the SHA-256 of its key, so repeated
+questions can skip the extraction LLM call across processes and restarts.
+"""
+import hashlib
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import orjson
+
+from .common import log
+
+
+class ExtractionCache:
+    """
+    Stores extraction results as {directory}/{sha256}.json files.
+
+    Keys should include everything that changes the result (prompt version,
+    model, query); see make_key(). Writes are atomic, so concurrent processes
+    can share a directory.
+    """
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        """Hashes the given parts (joined with '|') into a cache key."""
+        return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Returns the stored entry for key, or None on a miss or unreadable file."""
+        try:
+            return orjson.loads(self._path(key).read_bytes())
+        except FileNotFoundError:
+            return None
+        except (OSError, orjson.JSONDecodeError) as e:
+            log(f"Warning: Ignoring unreadable extraction cache entry {key}: {e}")
+            return None
+
+    def set(self, key: str, value: Dict[str, Any]):
+        """Stores value (plus a 'ts' timestamp) under key."""
+        path = self._path(key)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            tmp.write_bytes(orjson.dumps({**value, "ts": time.time()}))
+            os.replace(tmp, path)
+        except OSError as e:
+            log(f"Warning: Could not write extraction cache entry {key}: {e}")
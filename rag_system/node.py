@@ -1,11 +1,18 @@
 """ReAct agent node implementation."""
-from typing import List, Callable
-import json
-from langchain_openai import ChatOpenAI
-from langgraph.prebuilt import create_react_agent
+import threading
+import traceback
+from collections import OrderedDict
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Callable, List, Tuple
+import orjson
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage, trim_messages
+from langchain_core.messages.utils import count_tokens_approximately
 from .state import GraphState
 from .common import log
 
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
 
 # General purpose system prompt
 SYSTEM_PROMPT = """You are a helpful assistant for the UAV RAG system, focused on aerodynamic analysis and engineering documentation.
@@ -19,6 +26,35 @@ Core requirements:
 Follow a ReAct style reasoning loop: think → choose tool → observe → repeat → final answer."""
 
 
+# Token budget for the message history passed to the ReAct agent
+HISTORY_TOKEN_BUDGET = 3000
+# Rough per-message overhead (role and separators) added to the content tokens
+_MESSAGE_TOKEN_OVERHEAD = 4
+
+
+@lru_cache(maxsize=1)
+def _get_token_encoding():
+    """Loads the tokenizer once; returns None if tiktoken or its encoding file is unavailable."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        log(f"Warning: tiktoken encoding unavailable, estimating history tokens: {e}")
+        return None
+
+
+def _count_message_tokens(messages: List[BaseMessage]) -> int:
+    """Counts tokens in message contents with tiktoken, or estimates them without it."""
+    encoding = _get_token_encoding()
+    if encoding is None:
+        return count_tokens_approximately(messages)
+    total = 0
+    for message in messages:
+        content = message.content if isinstance(message.content, str) else str(message.content)
+        total += len(encoding.encode(content, disallowed_special=())) + _MESSAGE_TOKEN_OVERHEAD
+    return total
+
+
 def _build_standard_format(tool_responses, ai_responses):
     """Build standard formatted output for tool responses."""
     answer_parts = ["# 🎯 查詢結果\n"]
@@ -31,7 +67,11 @@ def _build_standard_format(tool_responses, ai_responses):
         answer_parts.append(f"\n## {idx}. 【{tool_name}】\n")
         
         try:
-            data = json.loads(tool_content)
+            # Tools with response_format="content_and_artifact" hand over their
+            # structured output directly; only plain text content needs parsing
+            data = tr.get('artifact')
+            if data is None:
+                data = orjson.loads(tool_content)
             if isinstance(data, dict):
                 if 'error' in data:
                     answer_parts.append(f"⚠️ 錯誤: {data['error']}\n")
@@ -49,7 +89,7 @@ def _build_standard_format(tool_responses, ai_responses):
                             answer_parts.append(f"**{key}** = {value}\n")
             else:
                 answer_parts.append(str(data))
-        except json.JSONDecodeError:
+        except orjson.JSONDecodeError:
             answer_parts.append(tool_content)
         
         answer_parts.append("\n---\n")
@@ -117,13 +157,36 @@ def _build_sources_section(source_entries: List[str]) -> str:
     return f"\n\n參考資料:\n{bullets}"
 
 
-def create_agent_node(llm: ChatOpenAI, tools: List[Callable]) -> Callable:
+# Compiled ReAct agents for the most recently used (llm, tools) combinations, so
+# graphs rebuilt in the same process reuse them. Keyed by object ids; each entry
+# holds the llm and tools themselves so the ids can't be recycled while it exists.
+_AGENT_CACHE_SIZE = 16
+_AGENT_CACHE: "OrderedDict[Tuple[int, ...], Tuple[ChatOpenAI, Tuple[Callable, ...], Any]]" = OrderedDict()
+_AGENT_CACHE_LOCK = threading.Lock()
+
+
+def _get_react_agent(llm: "ChatOpenAI", tools: List[Callable]):
+    """Returns the compiled ReAct agent for llm and tools, building it on first use."""
+    # Imported here: langgraph.prebuilt is slow to import and only needed once per agent
+    from langgraph.prebuilt import create_react_agent
+
+    tools = tuple(tools)
+    key = (id(llm), *map(id, tools))
+    with _AGENT_CACHE_LOCK:
+        entry = _AGENT_CACHE.get(key)
+        if entry is not None and entry[0] is llm and all(a is b for a, b in zip(entry[1], tools)):
+            _AGENT_CACHE.move_to_end(key)
+            return entry[2]
+        agent = create_react_agent(llm, list(tools), prompt=SYSTEM_PROMPT)
+        _AGENT_CACHE[key] = (llm, tools, agent)
+        if len(_AGENT_CACHE) > _AGENT_CACHE_SIZE:
+            _AGENT_CACHE.popitem(last=False)
+        return agent
+
+
+def create_agent_node(llm: "ChatOpenAI", tools: List[Callable]) -> Callable:
     """Create a ReAct agent node for the workflow."""
-    agent_executor = create_react_agent(
-        llm,
-        tools,
-        prompt=SYSTEM_PROMPT
-    )
+    agent_executor = _get_react_agent(llm, tools)
 
     def agent_node(state: GraphState) -> dict:
         """ReAct agent node for general queries."""
@@ -133,10 +196,22 @@ def create_agent_node(llm: ChatOpenAI, tools: List[Callable]) -> Callable:
         # The router ensures the message history is initialized
         messages_input = state['messages']
 
-        # Truncate message history to keep context size under control
-        if len(messages_input) > 4:
-            log(f"Message history has {len(messages_input)} messages. Truncating to the last 4.")
-            messages_input = messages_input[-4:]
+        # Keep the newest messages that fit the token budget, starting on a user
+        # turn so tool results are never separated from their tool calls
+        trimmed = trim_messages(
+            messages_input,
+            max_tokens=HISTORY_TOKEN_BUDGET,
+            token_counter=_count_message_tokens,
+            strategy="last",
+            start_on="human",
+            include_system=True,
+        )
+        if not trimmed:
+            # Even the latest turn is over budget; send it alone rather than nothing
+            trimmed = messages_input[-1:]
+        if len(trimmed) < len(messages_input):
+            log(f"Message history has {len(messages_input)} messages. Keeping the last {len(trimmed)} within {HISTORY_TOKEN_BUDGET} tokens.")
+        messages_input = trimmed
 
         try:
             result = agent_executor.invoke({
@@ -147,12 +222,13 @@ def create_agent_node(llm: ChatOpenAI, tools: List[Callable]) -> Callable:
             ai_responses = []
             
             for i, msg in enumerate(result['messages']):
-                if type(msg).__name__ == 'ToolMessage':
+                if isinstance(msg, ToolMessage):
                     tool_responses.append({
                         'name': getattr(msg, 'name', 'unknown_tool'),
-                        'content': msg.content
+                        'content': msg.content,
+                        'artifact': getattr(msg, 'artifact', None)
                     })
-                elif type(msg).__name__ == 'AIMessage' and msg.content.strip():
+                elif isinstance(msg, AIMessage) and msg.content.strip():
                     ai_responses.append(msg.content.strip())
 
             final_llm_answer = result['messages'][-1].content if result['messages'] else ""
@@ -178,8 +254,7 @@ def create_agent_node(llm: ChatOpenAI, tools: List[Callable]) -> Callable:
         except Exception as e:
             error_msg = f"處理問題時發生錯誤: {str(e)}"
             log(f"ERROR in agent_node: {error_msg}")
-            import traceback
             log(f"Traceback: {traceback.format_exc()}")
-            return {"generation": f"抱歉，{error_msg}"}
+            return {"generation": f"抱歉，{error_msg}", "error": error_msg}
 
     return agent_node
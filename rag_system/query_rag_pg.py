@@ -103,6 +103,7 @@ class RagApplication:
             openai_api_key=self.args.embed_api_key,
             openai_api_base=api_base,
             temperature=0,
+            service_tier=self.args.service_tier,
             http_client=client
         )
 
@@ -209,6 +210,7 @@ def main():
     parser.add_argument("--embed_api_base", default=os.environ.get("EMBED_API_BASE"), help="Embedding model API base URL")
     parser.add_argument("--llm_api_base", default=os.environ.get("LLM_API_BASE"), help="LLM/Chat model API base URL. Falls back to embed_api_base if not set.")
     parser.add_argument("--embed_api_key", default=os.environ.get("EMBED_API_KEY"), help="API key for both services")
+    parser.add_argument("--service-tier", default=os.environ.get("LLM_SERVICE_TIER") or None, help="OpenAI service tier for chat requests (e.g. priority); defaults to the provider's")
     parser.add_argument("--no-verify-ssl", action="store_true", help="停用 SSL 憑證驗證")
 
     # Query options
@@ -1,13 +1,17 @@
 """
 Intent routing node for the RAG agent.
 """
+from langchain_core.messages import HumanMessage
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_openai import ChatOpenAI
+from typing import TYPE_CHECKING
 
 from .state import GraphState
 from .common import log
 
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
 ROUTER_SYSTEM_PROMPT = """You are an expert at routing a user's request to the correct workflow.
 Based on the user's question, you must decide whether it is a "datcom_generation" request or a "general_query".
 
@@ -27,7 +31,7 @@ Based on the user's question, you must decide whether it is a "datcom_generation
 You must respond with ONLY the name of the route, either "datcom_generation" or "general_query".
 """
 
-def create_intent_router_node(llm: ChatOpenAI) -> callable:
+def create_intent_router_node(llm: "ChatOpenAI") -> callable:
     """
     Creates a node that routes the user's query to the correct workflow.
 
@@ -55,8 +59,6 @@ def create_intent_router_node(llm: ChatOpenAI) -> callable:
         Returns:
             A dictionary with the updated intent and initialized messages.
         """
-        from langchain_core.messages import HumanMessage
-        
         log("--- ROUTING INTENT ---")
         question = state["question"]
         log(f"Routing question: {question}")
@@ -17,12 +17,14 @@ class GraphState(MessagesState):
         collection: Selected collection name (from router tool)
         retrieved_docs: Documents retrieved from vectorstore
         intent: Routing intent (datcom_generation or general_query)
+        error: Error message when the agent failed (empty on success)
     """
     question: str = ""
     generation: str = ""
     collection: str = ""
     retrieved_docs: list = []
     intent: str = ""
+    error: str = ""
 
 
 # Backward compatibility: TypedDict version for legacy code
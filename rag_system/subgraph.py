@@ -124,6 +124,7 @@ def test_subgraph_standalone(question: str, config: RAGConfig):
         openai_api_key=config.embed_api_key,
         openai_api_base=api_base,
         temperature=config.temperature,
+        service_tier=config.service_tier,
         http_client=client
     )
 
@@ -399,7 +399,12 @@ def validate_datcom_parameters(params: Dict[str, Any]) -> Dict[str, Any]:
 # ============================================================================
 
 def create_datcom_calculator_tools() -> List:
-    """Creates the complete DATCOM calculator toolset."""
+    """
+    Creates the complete DATCOM calculator toolset.
+
+    The tools are module-level singletons built at import time, so this only
+    assembles a new list; calling it repeatedly is cheap.
+    """
     return [
         convert_wing_to_datcom,
         convert_tail_to_datcom,
@@ -0,0 +1,37 @@
+from rag_system.build.chunking import clean_text, _fast_split
+
+
+def test_clean_text_collapses_whitespace_and_newlines():
+    text = "  第一條\r\n\n\n\n本法  適用\t　範圍  "
+
+    assert clean_text(text) == "第一條\n\n本法 適用 範圍"
+
+
+def test_clean_text_preserves_latex_blocks():
+    text = "公式  $a  +  b$ 與\n\n\n\n$$x   =\n\n\n\ny$$  結束"
+
+    assert clean_text(text) == "公式 $a  +  b$ 與\n\n$$x   =\n\n\n\ny$$ 結束"
+
+
+def test_clean_text_does_not_leak_placeholders_for_nested_math():
+    text = "$a $$x$$ b$"
+
+    assert "__LATEX_" not in clean_text(text)
+
+
+def test_fast_split_respects_max_chars_and_prefers_paragraphs():
+    text = "\n\n".join(["甲" * 30, "乙" * 30, "丙" * 30])
+
+    parts = _fast_split(text, max_chars=70, overlap=0)
+
+    assert parts == ["甲" * 30 + "\n\n" + "乙" * 30, "丙" * 30]
+
+
+def test_fast_split_carries_overlap_and_cuts_long_lines():
+    text = "\n\n".join(["甲" * 40, "乙" * 40]) + "\n" + "丙" * 150
+
+    parts = _fast_split(text, max_chars=50, overlap=5)
+
+    assert all(len(p) <= 50 for p in parts)
+    assert parts[1].startswith("甲" * 5)
+    assert "".join(parts).count("丙") >= 150
@@ -0,0 +1,112 @@
+import asyncio
+
+from langchain_core.exceptions import OutputParserException
+from langchain_core.runnables import RunnableLambda
+
+from rag_system import datcom_node
+from rag_system.datcom_node import DatcomParams, _find_json_object, _parse_alpha_range, _regex_extract
+
+
+QUERY = "wing area 530, aspect ratio 2.8 at mach 0.8"
+
+
+def _extractor(monkeypatch, structured, text=lambda _: "no json"):
+    """Builds a parameter extractor whose LLM chains are the given functions."""
+    chains = (RunnableLambda(structured), RunnableLambda(text))
+    monkeypatch.setattr(datcom_node, "_extraction_chains", lambda llm: chains)
+    monkeypatch.delenv("EXTRACTION_CACHE_DIR", raising=False)
+    return datcom_node._create_param_extractor(llm=None)
+
+
+def test_parse_alpha_range_includes_end_point():
+    alphas = _parse_alpha_range("攻角 -2到10度步進2度")
+
+    assert alphas == [-2.0, 0.0, 2.0, 4.0, 6.0, 8.0, 10.0]
+
+
+def test_parse_alpha_range_rejects_empty_or_backward_ranges():
+    assert _parse_alpha_range("馬赫 0.8") is None
+    assert _parse_alpha_range("10到-2度步進2度") is None
+    assert _parse_alpha_range("0到10度步進0度") is None
+
+
+def test_regex_extract_parses_key_value_queries():
+    query = "wing_S=530, wing_A=2.8, wing_lambda=0.3, wing_sweep_angle=0, mach=[0.8, 1.2], 高度=10000"
+
+    params = _regex_extract(query)
+
+    assert params.wing_S == 530.0
+    assert params.wing_sweep_angle == 0.0
+    assert params.mach_numbers == [0.8, 1.2]
+    assert params.altitudes == [10000.0]
+
+
+def test_regex_extract_defers_to_llm_for_uncovered_numbers():
+    base = "wing_S=530, wing_A=2.8, wing_lambda=0.3, wing_sweep_angle=45, mach=0.8, altitude=10000"
+
+    assert _regex_extract(base + ", 重心在 8 呎") is None
+    assert _regex_extract(base.replace("wing_A=2.8", "span=2.8")) is None
+    assert _regex_extract("wing_S=530, mach=0.8") is None
+
+
+def test_find_json_object_ignores_braces_in_strings_and_trailing_text():
+    text = 'Here you go: {"note": "a } and a \\" {", "nested": {"x": 1}} and {"second": 2}'
+
+    assert _find_json_object(text) == '{"note": "a } and a \\" {", "nested": {"x": 1}}'
+
+
+def test_find_json_object_returns_none_without_a_closed_object():
+    assert _find_json_object("no json here") is None
+    assert _find_json_object('{"open": {"x": 1}') is None
+
+
+def test_extractor_memoises_results_and_returns_copies(monkeypatch):
+    calls = []
+
+    def structured(inputs):
+        calls.append(inputs["query"])
+        return DatcomParams(wing_S=530)
+
+    extractor = _extractor(monkeypatch, structured)
+    first = extractor.invoke(QUERY)
+    first.wing_S = 0
+    second = extractor.invoke("  " + QUERY.replace(" ", "   "))
+
+    assert calls == [QUERY]
+    assert second.wing_S == 530
+
+
+def test_extractor_does_not_memoise_failed_extractions(monkeypatch):
+    calls = []
+
+    def structured(inputs):
+        raise OutputParserException("bad output")
+
+    def text(inputs):
+        calls.append(inputs["query"])
+        return "Sorry, I cannot help with that."
+
+    extractor = _extractor(monkeypatch, structured, text)
+
+    assert extractor.invoke(QUERY) == DatcomParams()
+    assert extractor.invoke(QUERY) == DatcomParams()
+    assert len(calls) == 2
+
+
+def test_extractor_shares_one_call_among_concurrent_queries(monkeypatch):
+    calls = []
+
+    async def structured(inputs):
+        calls.append(inputs["query"])
+        await asyncio.sleep(0.05)
+        return DatcomParams(wing_S=530)
+
+    extractor = _extractor(monkeypatch, structured)
+
+    async def run():
+        return await asyncio.gather(*(extractor.ainvoke(QUERY) for _ in range(3)))
+
+    results = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert [r.wing_S for r in results] == [530, 530, 530]
@@ -0,0 +1,73 @@
+import io
+import struct
+import uuid
+from contextlib import contextmanager
+
+import orjson
+
+from rag_system.build import db_utils
+from rag_system.build.db_utils import _vector_binary, copy_embeddings
+
+
+class _CopyCursor:
+    def __init__(self, sink):
+        self.sink = sink
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def copy_expert(self, sql, buf):
+        self.sink.append(buf.read())
+
+
+class _CopyConnection:
+    def __init__(self, sink):
+        self.sink = sink
+
+    def cursor(self):
+        return _CopyCursor(self.sink)
+
+
+def _read_field(stream):
+    (length,) = struct.unpack("!i", stream.read(4))
+    return stream.read(length)
+
+
+def test_vector_binary_packs_dimension_and_big_endian_floats():
+    data = _vector_binary([1.0, -2.5])
+
+    assert data == struct.pack("!hh", 2, 0) + struct.pack("!ff", 1.0, -2.5)
+
+
+def test_copy_embeddings_frames_binary_rows_and_drops_duplicate_ids(monkeypatch):
+    sink = []
+
+    @contextmanager
+    def fake_connection(conn_str):
+        yield _CopyConnection(sink)
+
+    monkeypatch.setattr(db_utils, "_pooled_connection", fake_connection)
+    collection_id = str(uuid.uuid4())
+
+    loaded = copy_embeddings(
+        "postgresql://test", collection_id,
+        ["a", "b", "a"], ["甲", "乙", "丙"], [[1.0], [2.0], [3.0]], [{"k": 1}, {}, {}]
+    )
+
+    stream = io.BytesIO(sink[0])
+    assert loaded == 2
+    assert stream.read(19) == b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+    assert struct.unpack("!h", stream.read(2)) == (5,)
+    assert _read_field(stream) == b"a"
+    assert _read_field(stream) == uuid.UUID(collection_id).bytes
+    assert _read_field(stream) == _vector_binary([1.0])
+    assert _read_field(stream) == "甲".encode("utf-8")
+    assert _read_field(stream) == b"\x01" + orjson.dumps({"k": 1})
+    assert struct.unpack("!h", stream.read(2)) == (5,)
+    assert _read_field(stream) == b"b"
+    for _ in range(4):
+        _read_field(stream)
+    assert stream.read() == struct.pack("!h", -1)
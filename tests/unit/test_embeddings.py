@@ -0,0 +1,99 @@
+import base64
+
+import httpx
+import numpy as np
+import orjson
+import pytest
+
+from rag_system.common import LocalApiEmbeddings
+
+
+def _embedder(handler, **kwargs):
+    """Builds an embedder whose HTTP requests are answered by handler."""
+    embedder = LocalApiEmbeddings("http://embed.test/v1", "key", verify_ssl=True, **kwargs)
+    embedder.client = httpx.Client(transport=httpx.MockTransport(handler))
+    return embedder
+
+
+def _vectors(request, dim=2):
+    count = len(orjson.loads(request.content)["input"])
+    return {"data": [{"embedding": [float(i)] * dim} for i in range(count)]}
+
+
+def test_parse_embeddings_decodes_base64_float32():
+    vectors = np.array([[1.0, -2.5], [0.5, 3.0]], dtype="<f4")
+    data = {"data": [{"embedding": base64.b64encode(v.tobytes()).decode()} for v in vectors]}
+
+    parsed = LocalApiEmbeddings._parse_embeddings(data)
+
+    assert parsed.dtype == np.float32
+    assert parsed.tolist() == [[1.0, -2.5], [0.5, 3.0]]
+
+
+def test_parse_embeddings_accepts_float_lists():
+    parsed = LocalApiEmbeddings._parse_embeddings({"data": [{"embedding": [1.0, 2.0]}]})
+
+    assert parsed.tolist() == [[1.0, 2.0]]
+
+
+def test_base64_rejection_switches_to_float_lists():
+    formats = []
+
+    def handler(request):
+        encoding_format = orjson.loads(request.content)["encoding_format"]
+        formats.append(encoding_format)
+        if encoding_format == "base64":
+            return httpx.Response(400, json={"error": "unsupported encoding_format"})
+        return httpx.Response(200, json=_vectors(request))
+
+    with _embedder(handler) as embedder:
+        embedder.embed_documents(["a"])
+        embedder.embed_documents(["b"])
+
+    assert formats == ["base64", "float", "float"]
+
+
+def test_transient_statuses_are_retried_after_retry_after():
+    statuses = iter([503, 429, 200])
+
+    def handler(request):
+        status = next(statuses)
+        if status != 200:
+            return httpx.Response(status, headers={"Retry-After": "0"})
+        return httpx.Response(200, json=_vectors(request))
+
+    with _embedder(handler, encoding_format="float") as embedder:
+        vectors = embedder.embed_documents(["a"])
+
+    assert vectors == [[0.0, 0.0]]
+    assert next(statuses, None) is None
+
+
+def _gzip_rejecting_handler(status, seen):
+    def handler(request):
+        seen.append(request.headers.get("Content-Encoding"))
+        if request.headers.get("Content-Encoding") == "gzip":
+            return httpx.Response(status)
+        return httpx.Response(200, json=_vectors(request))
+    return handler
+
+
+def test_gzip_body_is_resent_as_plain_json_after_415():
+    seen = []
+
+    with _embedder(_gzip_rejecting_handler(415, seen), encoding_format="float") as embedder:
+        embedder.embed_documents(["x" * 5000])
+        assert embedder.compress_requests is False
+
+    assert seen == ["gzip", None]
+
+
+def test_other_client_errors_keep_gzip_enabled():
+    seen = []
+
+    with _embedder(_gzip_rejecting_handler(400, seen), encoding_format="float") as embedder:
+        with pytest.raises(httpx.HTTPStatusError):
+            embedder.embed_documents(["x" * 5000])
+        assert embedder.compress_requests is True
+
+    assert seen == ["gzip"]